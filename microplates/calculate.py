@@ -4,14 +4,208 @@ background values, divide by value for a control condition, etc.
 """
 
 from __future__ import division
+import os
 import inspect
+import functools
 
 import pandas as pd
 import numpy as np
 
 
+class SubtractAt(object):
+    """Normalization for :func:`calc_norm`: subtract the value found at `key`
+    (in the column given by ``on``) from every value in the group.
 
-def calc_norm(df, value='OD600', on='conc', columns=[], how=None):
+    ``how=SubtractAt(0)`` is equivalent to ``how=lambda x: x - x.loc[0]``, but
+    :func:`calc_norm` can recognize it and compute it without calling back
+    into Python for every group.
+
+    Parameters
+    ----------
+    key : scalar
+        Value of the ``on`` column giving the reference measurement
+    """
+    def __init__(self, key):
+        self.key = key
+
+    def __call__(self, x):
+        return x - x.loc[self.key]
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.key)
+
+
+class SubtractMeanAt(object):
+    """Normalization for :func:`calc_norm`: subtract the mean of the values
+    found at `key` (in the column given by ``on``) from every value in the group.
+
+    ``how=SubtractMeanAt(0)`` is equivalent to
+    ``how=lambda x: x - x.loc[0].mean()``, and like :class:`SubtractAt` is
+    computed by :func:`calc_norm` without a Python call per group.
+
+    Parameters
+    ----------
+    key : scalar
+        Value of the ``on`` column giving the reference measurement(s)
+    """
+    def __init__(self, key):
+        self.key = key
+
+    def __call__(self, x):
+        return x - x.loc[self.key].mean()
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.key)
+
+
+@functools.lru_cache(maxsize=128)
+def _code_arity(code):
+    # the number of parameters inspect.signature would list for a plain
+    # function with this code
+    return (code.co_argcount + code.co_kwonlyargcount
+        + bool(code.co_flags & inspect.CO_VARARGS)
+        + bool(code.co_flags & inspect.CO_VARKEYWORDS))
+
+def _arity(how):
+    """private; number of arguments the normalization function `how` accepts.
+
+    Cached for plain functions by their code object, since callers often
+    normalize repeatedly with the same `how`, or with a new lambda from the
+    same source each time; the cache holds no reference to the functions
+    themselves, their closures or the frames they capture.
+    """
+    if (inspect.isfunction(how) and not hasattr(how, '__wrapped__')
+            and not hasattr(how, '__signature__')):
+        return _code_arity(how.__code__)
+    try:
+        return len(inspect.signature(how).parameters)
+    except ValueError:
+        # no signature available (e.g. a numpy ufunc); assume it takes the
+        # column alone
+        return 1
+
+def _apply_how(how, column, *args):
+    """private; apply `how` to one group, i.e. ``how(column[, name[, group]])``.
+    Defined at module level so it can be handed to ``joblib``.
+
+    Like `transform`, a Series returned by `how` is aligned to `column` by
+    its labels, not by position; anything else is taken in order.
+    """
+    result = how(column, *args)
+    if isinstance(result, pd.Series) and not result.index.equals(column.index):
+        result = result.reindex(column.index)
+    return np.asarray(result)
+
+
+@functools.lru_cache(maxsize=None)
+def _numba_kernel(kind, key):
+    """private; build a kernel for ``transform(..., engine='numba')``. Cached so
+    pandas sees the same function object, and re-uses its compiled version,
+    each time the same normalization is requested.
+    """
+    if kind is SubtractMeanAt:
+        def kernel(values, index):
+            return values - values[index == key].mean()
+    else:
+        def kernel(values, index):
+            return values - values[index == key][0]
+    return kernel
+
+
+def _group_codes(work, cols):
+    """private; integer code (``0 .. ngroups - 1``, in order of appearance) of
+    the group each row of `work` falls in when grouped by `cols`. Returns
+    ``(codes, ngroups)``.
+    """
+    grouper = work.groupby(cols, sort=False, observed=True)
+
+    # rows dropped by the groupby (NaN in `cols`) have no group number; give
+    # them code -1
+    codes = grouper.ngroup().to_numpy(dtype=np.float64, na_value=-1).astype(np.intp)
+    return codes, grouper.ngroups
+
+
+def _reference_rows(work, cols, how):
+    """private; find the reference rows of each group for the built-in
+    normalizations :class:`SubtractAt` and :class:`SubtractMeanAt`.
+
+    `work` is indexed by the ``on`` column. Returns ``(codes, ngroups,
+    is_ref, counts)``: the group code of each row (see :func:`_group_codes`),
+    whether each row is a reference row, and the number of reference rows in
+    each group. Raises a KeyError if some group has no row at ``how.key``, or
+    (for :class:`SubtractAt`) a ValueError if some group has several, as
+    applying `how` to each group would.
+    """
+    codes, ngroups = _group_codes(work, cols)
+    is_ref = (codes >= 0) & work.index.isin([how.key])
+
+    counts = np.bincount(codes[is_ref], minlength=ngroups)
+    if (counts == 0).any():
+        raise KeyError(how.key)
+    if not isinstance(how, SubtractMeanAt) and (counts > 1).any():
+        raise ValueError("Some groups have more than one value at %r; use "
+            "SubtractMeanAt to subtract their mean" % (how.key,))
+    return codes, ngroups, is_ref, counts
+
+
+def _subtract_reference(work, value, cols, how):
+    """private; vectorized equivalent of ``calc_norm(..., how=how)`` for the
+    built-in normalizations :class:`SubtractAt` and :class:`SubtractMeanAt`.
+
+    `work` is indexed by the ``on`` column. Each row is assigned an integer
+    code for its group; the reference value of each group is gathered into an
+    array by code, then subtracted from every row in one step.
+    """
+    values = np.ascontiguousarray(work[value].to_numpy(dtype=np.float64))
+    codes, ngroups, is_ref, counts = _reference_rows(work, cols, how)
+    in_group = codes >= 0
+
+    if isinstance(how, SubtractMeanAt):
+        sums = np.bincount(codes[is_ref], weights=values[is_ref], minlength=ngroups)
+        ref = sums / counts
+    else:
+        ref = np.empty(ngroups)
+        ref[codes[is_ref]] = values[is_ref]
+
+    out = np.full(len(values), np.nan)
+    np.subtract(values, ref[codes], out=out, where=in_group)
+    return out
+
+
+def _calc_norm_dask(df, value, on, cols, how, engine_kwargs):
+    """private; run :func:`calc_norm` on each partition of a dask DataFrame,
+    after shuffling the data so that each partition holds complete groups.
+    """
+    import dask.dataframe as dd
+
+    engine_kwargs = dict(engine_kwargs or {})
+    npartitions = engine_kwargs.pop('npartitions', os.cpu_count() or 1)
+
+    if isinstance(df, pd.DataFrame):
+        # remember the original row order, since the shuffle does not keep it
+        ddf = dd.from_pandas(df.reset_index(drop=True), npartitions=npartitions)
+    else:
+        ddf = df
+
+    # move all rows of each group into the same partition
+    ddf = ddf.shuffle(on=cols, **engine_kwargs)
+
+    meta = ddf._meta.copy()
+    meta[value] = meta[value].astype(float)
+
+    # `partial` rather than a lambda, so the task can be pickled and sent to
+    # worker processes
+    out = ddf.map_partitions(
+        functools.partial(calc_norm, value=value, on=on, columns=cols, how=how),
+        meta=meta)
+
+    if isinstance(df, pd.DataFrame):
+        out = out.compute().sort_index()
+        out.index = df.index
+    return out
+
+
+def calc_norm(df, value='OD600', on='conc', columns=[], how=None, engine=None, engine_kwargs=None, n_jobs=1):
     """
     Normalizes the `value` of some column by a particular column `on`,using a
     transformation function `how`. Useful for subtracting the first timepoint,
@@ -37,11 +231,36 @@ def calc_norm(df, value='OD600', on='conc', columns=[], how=None):
     on : str
         Name of a column which should be used to set the index in the normalization
         function `how`.
+    engine : str, optional
+        ``'numba'`` to compute the built-in normalizations (:class:`SubtractAt`
+        and :class:`SubtractMeanAt`) with pandas' numba engine; requires
+        ``numba``, and a numeric ``on`` column. Any other `how` is applied in
+        Python as usual.
+
+        ``'dask'`` to split the data into partitions holding complete groups
+        and normalize the partitions in parallel with ``dask``, using
+        whichever scheduler is configured. `df` may then also be a
+        ``dask.dataframe.DataFrame``, in which case a lazy
+        ``dask.dataframe.DataFrame`` is returned; `how` must be picklable
+        to use a multi-process or distributed scheduler.
+    engine_kwargs : dict, optional
+        With ``engine='numba'``, passed to pandas as ``engine_kwargs``;
+        defaults to ``{'nopython': True, 'parallel': True}``. With
+        ``engine='dask'``, may contain ``npartitions`` (number of partitions
+        to split a pandas `df` into; defaults to the number of CPUs); other
+        keys are passed to ``dask.dataframe.DataFrame.shuffle``.
+    n_jobs : int, optional
+        Number of groups to normalize at once with ``joblib`` (``-1`` for one
+        per CPU). Threads are used by default, which helps when `how` spends
+        its time in numpy; use ``joblib.parallel_config(backend='loky')`` to
+        use processes instead, in which case `how` must be picklable. Has no
+        effect on the built-in normalizations, which are vectorized anyway.
 
     Returns
     -------
     df : pd.DataFrame
-        same shape as input, but with transformation applied.
+        same shape, columns and index as the input, but with the transformation
+        applied to the `value` column. The input is not modified.
 
 
     Examples
@@ -60,11 +279,11 @@ def calc_norm(df, value='OD600', on='conc', columns=[], how=None):
     ...     on='time',
     ...     columns=['time','concentration'],
     ...     how=lambda x: x - x.loc[0])
-       time well  OD600  concentration
-    0     0   A1  0.000             10
-    1     0   A2  0.000            100
-    2     1   A1  0.022             10
-    3     1   A2  0.019            100
+      well  OD600  time  concentration
+    0   A1  0.000     0             10
+    1   A2  0.000     0            100
+    2   A1  0.018     1             10
+    3   A2  0.022     1            100
 
 
     Normalize to the value at concentration = 10 for each timepoint
@@ -74,11 +293,11 @@ def calc_norm(df, value='OD600', on='conc', columns=[], how=None):
     ...     on='concentration',
     ...     columns=['time','concentration'],
     ...     how=lambda x: x - x.loc[10])
-       concentration well  OD600  time
-    0             10   A1  0.000     0
-    1            100   A2  0.001     0
-    2             10   A1  0.000     1
-    3            100   A2  0.005     1
+      well  OD600  time  concentration
+    0   A1  0.000     0             10
+    1   A2  0.001     0            100
+    2   A1  0.000     1             10
+    3   A2  0.005     1            100
 
 
     Normalize to the average of the measurements at time = 0
@@ -96,72 +315,170 @@ def calc_norm(df, value='OD600', on='conc', columns=[], how=None):
     ...     on='time',
     ...     columns=['time','concentration'],
     ...     how=lambda x: x - x.loc[0].mean())
-       time well         OD600  concentration
-    0     0   A1  1.000000e-03             10
-    1     0   A2 -1.000000e-03             10
-    2     0   A3 -4.336809e-19             10
-    3     1   A1  4.100000e-02             10
-    4     1   A2  3.900000e-02             10
-    5     1   A3  4.000000e-02             10
+      well         OD600  time  concentration
+    0   A1  1.000000e-03     0             10
+    1   A2 -1.000000e-03     0             10
+    2   A3 -4.336809e-19     0             10
+    3   A1  4.100000e-02     1             10
+    4   A2  3.900000e-02     1             10
+    5   A3  4.000000e-02     1             10
 
     """
-    cols = columns
+    cols = list(columns)
 
     # group by all other columns
     if isinstance(on, list) or isinstance(on, tuple):
+        on_cols = list(on)
         cols = list(set(cols) - set(on))
     else:
+        on_cols = [on]
         if on in cols:
             cols.remove(on)
 
-    # index by the column we want to normalize on
-    df = df.copy().set_index(on)
-
-    # # select the column whose value we're interested in normalizing. Iterate
-    # # across all groups (e.g. all combinations of values for all other
-    # # columns), and apply the transformation. Usually the transformation will
-    # # be e.g. to subtract the first column
-    # df[value] = df.groupby(cols)[value].transform(how)
-
-    # # restore the index
-    # return df.reset_index()
+    if engine not in (None, 'numba', 'dask'):
+        raise ValueError("Unknown engine %r; expected None, 'numba' or 'dask'" % (engine,))
 
-    how_signature = inspect.signature(how)
-    if len(how_signature.parameters) == 1:
-        transform = lambda column, name, group: how(column)
-    elif len(how_signature.parameters) == 2:
-        transform = lambda column, name, group: how(column, name)
-    elif len(how_signature.parameters) > 2:
-        transform = how
+    if engine == 'dask':
+        return _calc_norm_dask(df, value, on, cols, how, engine_kwargs)
 
-    # store transformed DataFrames
-    new_dfs = []
+    # number of arguments `how` accepts: (column), (column, name) or
+    # (column, name, group)
+    arity = _arity(how)
 
-    for name,group in df.groupby(cols):
+    # the result is the caller's DataFrame with only the `value` column
+    # replaced, so a shallow copy is enough; the other columns are shared
+    out = df.copy(deep=False)
 
-        # `name` is a tuple of values in the same order as `cols`
-        # e.g. cols=['primer','RT','strain']
-        #      name=('rplU','+','PAO1')
-        # convert to a series to make it easier to access
-        if len(cols) == 1:
-            name_series = pd.Series([name],cols)
-        else:
-            name_series = pd.Series(list(name),cols)
+    # do the work on just the columns `how` can see, indexed by the column we
+    # want to normalize on. `how` is only given the whole group if it asks for
+    # it (3 arguments); otherwise the unrelated columns are never copied
+    if arity > 2:
+        work = df.set_index(on)
+    else:
+        # selecting columns already builds a new frame, so index it in place
+        # rather than building yet another one
+        work = df[on_cols + cols + [value]]
+        work.set_index(on, inplace=True)
+
+    if engine == 'numba' and isinstance(how, (SubtractAt, SubtractMeanAt)):
+        # the compiled kernel does no bounds checking, so make sure every
+        # group has its reference value(s) first
+        codes = _reference_rows(work, cols, how)[0]
+
+        kwargs = {'nopython': True, 'parallel': True}
+        if engine_kwargs is not None:
+            kwargs.update(engine_kwargs)
+        # pandas cannot run the kernel over rows in no group (code -1, e.g.
+        # NaN in one of `cols`), so leave them out; they come out as NaN, as
+        # from the other engines
+        in_group = codes >= 0
+        grouped = work if in_group.all() else work[in_group]
+        result = grouped.groupby(cols, sort=False, observed=True)[value].transform(
+            _numba_kernel(type(how), how.key), engine='numba', engine_kwargs=kwargs)
+
+        out_values = np.full(len(work), np.nan)
+        out_values[in_group] = result.to_numpy()
+        out[value] = out_values
+        return out
+
+    if isinstance(how, (SubtractAt, SubtractMeanAt)):
+        out[value] = _subtract_reference(work, value, cols, how)
+        return out
+
+    if arity == 1 and n_jobs == 1:
+        # `how` only needs the column itself, so let pandas apply it to each
+        # group (e.g. all combinations of values for all other columns) and
+        # write the result straight back into the value column
+        out[value] = work.groupby(cols, sort=False, observed=True)[value].transform(how).to_numpy()
+        return out
+
+    # slice each group's column out of plain arrays, rather than building a
+    # new DataFrame view for every group
+    values = work[value].to_numpy()
+    index = work.index
+
+    # the names of the group are handed to `how` as a Series indexed by
+    # `cols`; build that index once rather than once per group
+    name_index = pd.Index(cols)
+
+    # sort the rows by group once; each group's rows are then one contiguous
+    # slice of `order`, found by binary search rather than by hashing the
+    # group names. Rows in no group (code -1) sort first and are skipped
+    codes, ngroups = _group_codes(work, cols)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(ngroups + 1))
+
+    # the name of each group, read from its first row
+    names = work[cols].iloc[order[bounds[:-1]]].itertuples(index=False, name=None)
+
+    def groups():
+        for start, stop, name in zip(bounds[:-1], bounds[1:], names):
+            positions = order[start:stop]
+
+            # `column` is a Series indexed by `on`
+            column = pd.Series(values[positions], index=index[positions], name=value)
+            if arity == 1:
+                yield positions, (column,)
+                continue
+
+            # `name` is a tuple of values in the same order as `cols`
+            # e.g. cols=['primer','RT','strain']
+            #      name=('rplU','+','PAO1')
+            # convert to a series to make it easier to access
+            name_series = pd.Series(list(name), index=name_index)
+
+            # only slice out the whole group if `how` wants it
+            if arity == 2:
+                yield positions, (column, name_series)
+            else:
+                yield positions, (column, name_series, work.iloc[positions])
+
+    # keep each group's result as a plain array along with the positions of
+    # the rows it came from, rather than merging and concatenating frames
+    all_positions = []
+    if n_jobs == 1:
+        results = []
+        for positions, args in groups():
+            all_positions.append(positions)
+            results.append(_apply_how(how, *args))
+    else:
+        from joblib import Parallel, delayed
 
-        # `group[value]` is a DataFrame indexed by `on`, with a single column `value`
-        res = transform(group[value], name=name_series, group=group)  #how(group[value], name=name_series, group=group)
+        # joblib draws groups from `tasks` only as workers free up, so the
+        # per-group Series and frames never all exist at once; keep just the
+        # positions of each group's rows. Results come back in the same order
+        def tasks():
+            for positions, args in groups():
+                all_positions.append(positions)
+                yield delayed(_apply_how)(how, *args)
 
-        # merge changed values of the group returned by the transformation function
-        row = pd.DataFrame(res).combine_first(group).reset_index()
-        new_dfs.append(row)
+        results = Parallel(n_jobs=n_jobs, prefer='threads')(tasks())
 
-    # concatenate transformed DataFrames
-    return pd.concat(new_dfs)
+    out[value] = _scatter(results, all_positions, len(work))
+    return out
 
+def _scatter(results, all_positions, length):
+    """private; write each group's result back into the rows it came from.
 
-def normalize(df, value='OD600', on='conc', groupby=[], how=lambda x: x - x.loc[0.0], **kwargs):
+    The dtype of the output follows the results, as it would from
+    `transform`. Rows that fall in no group (e.g. NaN in one of the group
+    columns) come out as NaN.
+    """
+    if not results:
+        return np.full(length, np.nan)
+    positions = np.concatenate(all_positions)
+    results = np.concatenate([np.broadcast_to(res, pos.shape)
+        for res, pos in zip(results, all_positions)])
+    if len(positions) == length:
+        out_values = np.empty(length, dtype=results.dtype)
+        out_values[positions] = results
+        return out_values
+    return pd.Series(results, index=positions).reindex(np.arange(length)).to_numpy()
+
+def normalize(df, value='OD600', on='conc', groupby=[], how=SubtractAt(0.0), **kwargs):
     """
     Normalizes the `value` of some column using a transformation function `how`.
+    By default, subtracts the value where `on` is 0 from each group.
 
 
     Example: Normalize OD600 to the value at time = 0:
@@ -171,36 +488,3 @@ def normalize(df, value='OD600', on='conc', groupby=[], how=lambda x: x - x.loc[
 
     """
     return calc_norm(df, value=value, on=on, columns=groupby, how=how, **kwargs)
-    # cols = groupby
-    #
-    # # group by all other columns
-    # if isinstance(on, list) or isinstance(on, tuple):
-    #     cols = list(set(cols) - set(on))
-    # else:
-    #     if on in cols:
-    #         cols.remove(on)
-    #
-    # # index by the column we want to normalize on
-    # df = df.copy().set_index(on)
-    #
-    #
-    # # store transformed DataFrames
-    # new_dfs = []
-    #
-    # for name,group in df.groupby(cols):
-    #
-    #     # `name` is a tuple of values in the same order as `cols`
-    #     # e.g. cols=['primer','RT','strain']
-    #     #      name=('rplU','+','PAO1')
-    #     # convert to a series to make it easier to access
-    #     name_series = pd.Series(list(name),cols)
-    #
-    #     # `group[value]` is a DataFrame indexed by `on`, with a single column `value`
-    #     res = how(group[value], name=name_series, group=group)
-    #
-    #     # merge changed values of the group returned by the transformation function
-    #     row = pd.DataFrame(res).combine_first(group).reset_index()
-    #     new_dfs.append(row)
-    #
-    # # concatenate transformed DataFrames
-    # return pd.concat(new_dfs)
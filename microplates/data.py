@@ -11,9 +11,61 @@
     + :func:`fortify_plate`
 """
 
+import functools
+
 from .utils import *
+from .utils import _CELL_NAMES
+
+@functools.lru_cache(maxsize=None)
+def _plate_index(wells):
+    """private; index of all well names of a `wells`-well plate, in order,
+    named ``well``. Built once for each plate size; callers get a shallow
+    copy, so renaming it does not change the cached one
+    """
+    return pd.Index(_CELL_NAMES[wells].ravel(), dtype=str, name='well')
 
-def platemap_to_dataframe(prog=None, index=None, wells=96, include_row_column=False):
+def _categorize(data):
+    """private; convert the columns of `data` that hold strings (or other
+    non-numeric values) repeating a few distinct values to categoricals
+    """
+    for key in data.columns:
+        column = data[key]
+        if (pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column)
+                or isinstance(column.dtype, pd.CategoricalDtype)):
+            continue
+        try:
+            n = column.nunique()
+        except TypeError:
+            # unhashable values (e.g. lists or dicts) cannot be categories
+            continue
+        if n <= len(column) // 2:
+            data[key] = column.astype('category')
+    return data
+
+def _fit_to_range(value_arr, dim):
+    """private; reshape an array of values to the shape `dim` of a range, or
+    return None if it does not fit
+    """
+    # 0-d arrays (e.g. from numpy reductions) are scalars; broadcast them
+    if value_arr.ndim == 0:
+        return value_arr[()]
+
+    # shape is the same as range
+    if value_arr.shape == dim:
+        return value_arr
+
+    # otherwise, try to treat value_arr as a 1d sequence
+    value_arr = value_arr.squeeze()
+    if len(value_arr.shape) == 1:
+        # if range is a single column, treat value_arr as a column vector
+        if dim[1] == 1 and value_arr.shape[0] == dim[0]:
+            return value_arr[:,np.newaxis]
+
+        # if range is a single row, treat value_arr as a row vector
+        if dim[0] == 1 and value_arr.shape[0] == dim[1]:
+            return value_arr[np.newaxis,:]
+
+def platemap_to_dataframe(prog=None, index=None, wells=96, include_row_column=False, categorical=False):
     """
     Convert a dict `program` containing a platemap to a tidy pandas DataFrame
     (`spec`) encoding that platemap. The `spec` can then be joined to a tidy
@@ -166,6 +218,12 @@ def platemap_to_dataframe(prog=None, index=None, wells=96, include_row_column=Fa
         ``True`` to include columns named ``row`` and ``column`` in the resulting
         data frame, corresponding to the 0-indexed row/column in the original
         microtiter plate
+    categorical : bool
+        ``True`` to store columns of strings (or other non-numeric values)
+        that repeat a few distinct values across the plate (e.g. ``strain``,
+        ``drug``) as :class:`pandas.Categorical`, which takes much less memory
+        and groups faster. Note that :func:`pandas.fillna` can then only fill
+        with one of the existing categories.
 
     Returns
     -------
@@ -211,23 +269,34 @@ def platemap_to_dataframe(prog=None, index=None, wells=96, include_row_column=Fa
         wells = prog['wells']
     dims = plates[wells]
 
-    columns = set()
-    cells = []
-    for i in range(dims[0]):
-        for j in range(dims[1]):
-            cells.append(tuple2cell(i,j))
-    data = pd.DataFrame(index=cells)
-    data.index = data.index.rename('well')
+    # build each column as an array in the shape of the plate, so each range
+    # is a rectangular slice of it, then make the DataFrame once at the end;
+    # assigning to a DataFrame one cell at a time is very slow
+    data = {}
+    def column(key):
+        if key not in data:
+            data[key] = np.full(dims, np.nan, dtype=object)
+        return data[key]
 
     if include_row_column:
-        for i in range(dims[0]):
-            for j in range(dims[1]):
-                data.loc[tuple2cell(i,j),'row'] = i
-                data.loc[tuple2cell(i,j),'column'] = j
+        data['row'], data['column'] = np.indices(dims)
 
     # each key in `prog` should specify a range, and its value should be a dict of data to assign to that range
     #   e.g. 'A1:A2': {'strain': 'B. theta'}
     for rngs, values in prog.items():
+        if rngs == 'wells':
+            continue
+
+        # convert array_like values to arrays once, rather than once for
+        # each range they are applied to
+        arrays = {}
+        for key, value in values.items():
+            if isinstance(value, collections.abc.Sequence) and not isinstance(value, str):
+                arrays[key] = np.array(value)
+            elif isinstance(value, np.ndarray):
+                arrays[key] = value
+
+        prepared = {}
 
         # key may be a comma-separated list of ranges
         rngs = rngs.split(',')
@@ -235,62 +304,52 @@ def platemap_to_dataframe(prog=None, index=None, wells=96, include_row_column=Fa
 
             # keys may be ranges (e.g. 'A1:F12')
             tup = range2tuple(rng,wells=wells)
-            if tup is not None:
-
-                # calculate dimensions of range
-                dim = (tup[1][0]-tup[0][0]+1,tup[1][1]-tup[0][1]+1)
-
-                # for each row
-                for a, i in enumerate(range(tup[0][0], tup[1][0]+1)):
-
-                    # for each column
-                    for b, j in enumerate(range(tup[0][1], tup[1][1]+1)):
-                        cell = tuple2cell(i,j)
-
-                        # for each data, assign value
-                        for key, value in values.items():
-                            value_arr = None
-
-                            # if `value` is array_like
-                            if isinstance(value, collections.abc.Sequence) and not isinstance(value, str):
-                                value_arr = np.array(value)
-                            elif isinstance(value, np.ndarray) and not isinstance(value, str):
-                                value_arr = value
-
-                            if value_arr is not None:
-                                # value_arr = value_arr.squeeze()
-
-                                # and shape is the same as range,
-                                if value_arr.shape == dim:
-
-                                    # assign element-wise
-                                    data.loc[cell,key] = value_arr[a,b]
-                                    continue
 
-                                else: 
-                                    # try to treat value_arr as a 1d sequence
-                                    value_arr = value_arr.squeeze()
-                                    if len(value_arr.shape) == 1:
-                                        # if range is a single column, treat value_arr as a column vector
-                                        if value_arr.shape[0] == dim[0] and dim[1] == 1:
-                                            data.loc[cell,key] = value_arr[a]
-                                            continue
-
-                                        # if range is a single row, treat value_arr as a row vector
-                                        elif value_arr.shape[0] == dim[1] and dim[0] == 1:
-                                            data.loc[cell,key] = value_arr[b]
-                                            continue
-
-
-                            # otherwise, assign entire value
-                            data.loc[cell,key] = value
-
-            # keys may be single cells (e.g. 'B6')
-            else:
-                tup = cell2tuple(rng)
-                if tup is not None:
-                    for key, value in values.items():
-                        data.at[rng,key] = value
+            # or single cells (e.g. 'B6'), which are treated as a 1x1 range
+            if tup is None:
+                cell = cell2tuple(rng)
+                if cell is None:
+                    continue
+                tup = (cell, cell)
+
+            (r0, c0), (r1, c1) = tup
+            if r1 >= dims[0] or c1 >= dims[1]:
+                raise ValueError("Range %r does not fit in a %d-well plate" % (rng, wells))
+
+            # calculate dimensions of range
+            dim = (r1-r0+1, c1-c0+1)
+
+            rows = slice(r0, r1+1)
+            columns = slice(c0, c1+1)
+
+            # work out what to assign to each variable once for each shape of
+            # range in this rule: scalars as they are, array_like values
+            # reshaped to match the range. Rules that only contain scalars
+            # (the most common case) assign them as they are to any range
+            if arrays and dim not in prepared:
+                prepared[dim] = []
+                for key, value in values.items():
+                    if key in arrays:
+                        value = _fit_to_range(arrays[key], dim)
+                        if value is None:
+                            raise ValueError("Value for %r in range %r has shape %s, "
+                                "which does not match the shape of the range %s"
+                                % (key, rng, arrays[key].shape, dim))
+                    prepared[dim].append((key, value))
+
+            # for each data, assign value
+            for key, value in (prepared[dim] if arrays else values.items()):
+                column(key)[rows, columns] = value
+
+    data = pd.DataFrame({key: values.ravel() for key, values in data.items()},
+        index=_plate_index(wells).copy())
+
+    # columns were built as object arrays, so that each could hold any mix of
+    # values; give them proper dtypes now that they are complete
+    data = data.infer_objects()
+
+    if categorical:
+        data = _categorize(data)
 
     return data
 prog2spec = platemap_to_dataframe
@@ -345,15 +404,22 @@ def cherrypick(pick_wells, values={'Pick':True}, others = {}, wells=96):
 
     """
 
-    all_wells = iterate_wells(n=wells, wells=wells)
-    other_wells = set(all_wells) - set(pick_wells)
+    index = _plate_index(wells).copy()
+    picked = index.isin(pick_wells)
 
-    platemap = dict()
-    platemap[','.join(pick_wells)] = values
-    platemap[','.join(other_wells)] = others
+    # build each column directly, rather than writing out a platemap for
+    # `platemap_to_dataframe` to parse; as there, variables are only added
+    # if some well is given a value for them
+    data = {}
+    for mask, assign in ((picked, values), (~picked, others)):
+        if not mask.any():
+            continue
+        for key, value in assign.items():
+            if key not in data:
+                data[key] = np.full(len(index), np.nan, dtype=object)
+            data[key][mask] = value
 
-    df = platemap_to_dataframe(platemap, wells=wells)
-    return df
+    return pd.DataFrame(data, index=index).infer_objects()
 
 def combine_plate_dataframes(
         layout,
@@ -411,47 +477,60 @@ def combine_plate_dataframes(
     if dims_from[1]*n_plate_cols != dims_to[1]:
         raise Exception("Number of wells in layout (%d wells * %d plates) does not match target plate size (%d rows)".format(dims_from[1], n_plate_cols, dims_to[1]))
 
-    for i, plate_row in enumerate(layout):
-        for j, plate in enumerate(plate_row):
-            for cell,row in plate.iterrows():
-                r, c = cell2tuple(cell)
-                if interleave_rows:
-                    r = ratio_rows * r + (i % ratio_rows)
-                else:
-                    r = r + dims_from[0] * i
-
-                if interleave_columns:
-                    c = ratio_cols * c + j % ratio_cols
-                else:
-                    c = c + dims_from[1] * j
-
-                new_cell = tuple2cell(r,c)
-                newspec[new_cell] = row
-                if source_well is not None:
-                    newspec[new_cell][source_well] = cell
-    return pd.DataFrame(newspec).transpose()
+    # stack the plates, noting which position in `layout` each row came from,
+    # then move every row to its well in the new plate at once
+    sources = [(i, j, plate) for i, plate_row in enumerate(layout) for j, plate in enumerate(plate_row)]
+    newspec = pd.concat([plate for _, _, plate in sources])
+    lengths = [len(plate) for _, _, plate in sources]
+    i = np.repeat([source[0] for source in sources], lengths)
+    j = np.repeat([source[1] for source in sources], lengths)
+
+    r, c = wells2rows_cols(newspec.index)
+    if interleave_rows:
+        r = ratio_rows * r + (i % ratio_rows)
+    else:
+        r = r + dims_from[0] * i
+
+    if interleave_columns:
+        c = ratio_cols * c + j % ratio_cols
+    else:
+        c = c + dims_from[1] * j
+
+    cells = newspec.index
+    newspec.index = pd.Index(_CELL_NAMES[wells_to][r, c], dtype=str, name=cells.name)
+    if source_well is not None:
+        newspec[source_well] = cells.to_numpy()
+    return newspec
 combine_specs = combine_plate_dataframes
 
 
 
-def _map_plate(from_wells, to_wells):
-    """private
+@functools.lru_cache(maxsize=None)
+def _map_plate_idx(from_wells, to_wells):
+    """private; flat positions (``row * columns + column``) of the wells that
+    each well of a `from_wells` plate is copied to in a `to_wells` plate by
+    :func:`scale_plate`. Row ``k`` of the result is for the well at flat
+    position ``k`` of the `from_wells` plate. Cached; the array is read-only.
     """
-    mapping = {}
-    # make sure ratio is an integer
-    ratio = (plates[to_wells][0] // plates[from_wells][0],
-             plates[to_wells][1] // plates[from_wells][1])
+    (rows_from, cols_from), (rows_to, cols_to) = plates[from_wells], plates[to_wells]
+    ratio = (rows_to // rows_from, cols_to // cols_from)
 
-    for i in range(plates[from_wells][0]):
-        for j in range(plates[from_wells][1]):
-            mapping[tuple2cell(i,j)] = [tuple2cell(x,y) for x in range(ratio[0]*i, ratio[0]*(i+1)) for y in range(ratio[1]*j, ratio[1]*(j+1))]
+    i, j = np.indices((rows_from, cols_from)).reshape(2, -1, 1)
+    x, y = np.indices(ratio).reshape(2, 1, -1)
+    mapping = (ratio[0] * i + x) * cols_to + (ratio[1] * j + y)
+    mapping.setflags(write=False)
     return mapping
 
-_plate_conversion_maps = {
-    24:  {  96:  _map_plate(24, 96),   384: _map_plate(24, 384), 1536: _map_plate(24, 1536) },
-    96:  {  384: _map_plate(96, 384), 1536: _map_plate(96, 1536)  },
-    384: { 1536: _map_plate(96, 1536) }
-}
+@functools.lru_cache(maxsize=16)
+def _map_plate(from_wells, to_wells):
+    """private; names of the wells that each well of a `from_wells` plate is
+    copied to in a `to_wells` plate, as a dict of lists. Built on first use and
+    cached; see :func:`_map_plate_idx` for the array form
+    """
+    names_from = _CELL_NAMES[from_wells].ravel()
+    names_to = _CELL_NAMES[to_wells].ravel()
+    return {cell: names_to[positions].tolist()
+        for cell, positions in zip(names_from, _map_plate_idx(from_wells, to_wells))}
 
 
 def scale_plate(spec,from_wells,to_wells,include_row_column=True):
@@ -489,23 +568,31 @@ def scale_plate(spec,from_wells,to_wells,include_row_column=True):
     columns (typically the multiple is a power of 4).
     """
     delete_row_column = ('row' in spec.columns or 'column' in spec.columns) and not include_row_column
-    try:
-        conversion_map = _plate_conversion_maps[from_wells][to_wells]
-    except:
-        # raise Exception("Do not know how to convert %d-well plate to %d-well plate".format(from_wells,to_wells))
-        conversion_map = _plate_conversion_map(from_wells=from_wells, to_wells=to_wells)
 
-    newspec = {}
-    for name,row in spec.iterrows():
-        for cell in conversion_map[name]:
-            r = row.copy()
-            if include_row_column:
-                r['row'], r['column'] = cell2tuple(cell)
-            if delete_row_column:
-                del r['row'], r['column']
-            newspec[cell] = r
-
-    return pd.DataFrame(newspec).transpose()
+    # each well is copied to a block of wells; look up the flat positions
+    # of every new well at once, in the same order as the original wells
+    r, c = wells2rows_cols(spec.index)
+    if (r >= plates[from_wells][0]).any() or (c >= plates[from_wells][1]).any():
+        raise ValueError("Some wells do not fit in a %d-well plate" % from_wells)
+
+    # drop the old rows/columns before copying the data, rather than copying
+    # them to every new well only to drop them afterwards
+    if delete_row_column:
+        spec = spec.drop(columns=['row', 'column'], errors='ignore')
+
+    if from_wells == to_wells:
+        # same plate: every well maps to itself, so there is nothing to gather
+        positions = r * plates[from_wells][1] + c
+        newspec = spec.copy()
+    else:
+        mapping = _map_plate_idx(from_wells, to_wells)
+        positions = mapping[r * plates[from_wells][1] + c].ravel()
+        newspec = spec.iloc[np.arange(len(spec)).repeat(mapping.shape[1])]
+    newspec.index = pd.Index(_CELL_NAMES[to_wells].ravel()[positions], dtype=str, name=spec.index.name)
+    if include_row_column:
+        newspec['row'], newspec['column'] = np.divmod(positions, plates[to_wells][1])
+
+    return newspec
 convert_spec = scale_plate
 
 
@@ -557,26 +644,32 @@ def fortify_plate(df, inplace=False):
     """
     names = ['well', 'wells']
 
-    if not inplace:
-        df = df.copy()
+    # only the index changes, so without `inplace` return a new frame that
+    # shares the data instead of deep-copying it first
+    def rename_index(df):
+        if inplace:
+            df.index.rename('well', inplace=True)
+            return df
+        return df.rename_axis('well')
 
     if df.index.name is not None:
         for name in names:
             if (df.index.name.lower() == name):
-                df.index.rename('well', inplace=True)
-                return df
+                return rename_index(df)
 
-    if all(df.index.map(is_well)):
-        df.index.rename('well', inplace=True)
-        return df
+    # same test as `is_well`, for the whole index at once
+    if df.index.astype(str).str.fullmatch(cell_regex).all():
+        return rename_index(df)
 
     columns = df.columns.str.lower()
     for name in names:
         if name in columns:
             well_col = df.columns[columns.get_loc(name)]
-            df.set_index(well_col, inplace=True)
-            df.index.rename('well', inplace=True)
-            return df
+            if inplace:
+                df.set_index(well_col, inplace=True)
+            else:
+                df = df.set_index(well_col)
+            return rename_index(df)
 
     raise Exception('Cannot find column identifying the wells; '
     'pd.DataFrame must either have an index containing well-like '
@@ -633,36 +726,40 @@ def add_row_column(df, well_variable='well',
     1   A2   0.30         A             2
     2   B3   0.21         B             3
     """
-    if natural:
-        def row_mapper(x):
-            t = cell2tuple(x)
-            if t is not None: return row2letters(t[0])
-            else: return None
-        def col_mapper(x):
-            t = cell2tuple(x)
-            if t is not None: return t[1]+1
-            else: return None
-    else:
-        def row_mapper(x):
-            t = cell2tuple(x)
-            if t is not None: return t[0]
-            else: return None
-        def col_mapper(x):
-            t = cell2tuple(x)
-            if t is not None: return t[1]
-            else: return None
-
-    if not inplace:
-        df = df.copy()
-
     if well_variable is None:
-        wells = pd.Series(df.index, index=df.index)
+        wells = df.index.to_series()
     else: wells = df[well_variable]
 
+    # look every well name up in the table of well names at once; names that
+    # are not wells give NaN for both row and column
+    rows, columns = wells2rows_cols(wells.to_numpy(), strict=False)
+    valid = rows >= 0
+
+    def with_missing(values):
+        if valid.all():
+            return values
+        return np.where(valid, values, np.nan)
+
+    new_columns = {}
     if plate_row_variable is not None:
-        df[plate_row_variable] = wells.astype(str).apply(row_mapper)
+        if natural:
+            # name each row once; the trailing NaN is picked up by names
+            # that are not wells (row -1)
+            names = np.array([row2letters(i) for i in range(rows.max(initial=-1)+1)] + [np.nan], dtype=object)
+            new_columns[plate_row_variable] = names[rows]
+        else:
+            new_columns[plate_row_variable] = with_missing(rows)
     if plate_col_variable is not None:
-        df[plate_col_variable] = wells.astype(str).apply(col_mapper)
+        if natural:
+            columns = columns + 1
+        new_columns[plate_col_variable] = with_missing(columns)
+
+    # only columns are added, so without `inplace` there is no need to
+    # deep-copy the existing ones first
+    if not inplace:
+        return df.assign(**new_columns)
+    for name, values in new_columns.items():
+        df[name] = values
     return df
 
 
@@ -698,9 +795,32 @@ def pivot_plate(data,parameter='OD600',natural=True):
     array([[ 6,  8],
            [10, 12]])
     """
-    df = fortify_plate(data.copy())
-    df = add_row_column(df,natural=natural,well_variable=None)
-    return df.pivot(index='plate_row', columns='plate_column', values=parameter)
+    df = fortify_plate(data)
+
+    # find the physical rows and columns that appear in the data, and where
+    # each well falls among them
+    r, c = wells2rows_cols(df.index, strict=False)
+    valid = r >= 0
+    rows, row_pos = np.unique(r[valid], return_inverse=True)
+    columns, col_pos = np.unique(c[valid], return_inverse=True)
+
+    # scatter the position of each well's value in `df` onto the grid, then
+    # take the values for each column of the grid; -1 marks empty wells,
+    # which come out as NaN
+    grid = np.full((len(rows), len(columns)), -1)
+    grid[row_pos, col_pos] = np.flatnonzero(valid)
+    if (grid >= 0).sum() < valid.sum():
+        raise ValueError('Index contains duplicate entries, cannot reshape')
+
+    if natural:
+        rows = [row2letters(i) for i in rows]
+        columns = columns + 1
+    values = df[parameter].array
+    out = pd.DataFrame({
+        column: values.take(grid[:,k], allow_fill=True) for k, column in enumerate(columns)
+    }, index=pd.Index(rows, name='plate_row'))
+    out.columns.name = 'plate_column'
+    return out
 plate_pivot = pivot_plate
 
 
@@ -754,59 +874,58 @@ def assign_wells(df,
     """
 
     n_wells = wells
-    
-
-    separate_by_levels = df[separate_samples_by].unique()
-    separate_groups = [df[df[separate_samples_by] == x].copy() for x in separate_by_levels]
-    
-
-    if start_wells is None: start_wells = ['A1' for r in separate_by_levels]
 
+    # split the samples by level of `separate_samples_by`, in order of
+    # appearance, in a single pass over `df`
+    if separate_samples_by is None or separate_into is None:
+        separate_groups = [df.copy()]
+    else:
+        separate_groups = [group.copy() for _, group in
+            df.groupby(separate_samples_by, sort=False, dropna=False)]
 
-    if separate_into == 'plate':
-        # output_plates = []
-        
-        out = []
+    if start_wells is None: start_wells = ['A1' for group in separate_groups]
 
+    out = []
+    if separate_into in ('plate', 'plates'):
         current_plate = 0
         for i, group in enumerate(separate_groups):
-            plates, wells = zip(*(plates.utils.iterate_wells(len(group), start = start_wells[i], wells=n_wells, plate=True, start_plate=current_plate)))
-            last_plate = max(plates)+1
+            plate_numbers, well_names = zip(*iterate_wells(len(group), start=start_wells[i], wells=n_wells, plate=True, start_plate=current_plate))
 
-            group['Well'] = list(wells)
-            group['Plate'] = list(plates)
+            group['Well'] = list(well_names)
+            group['Plate'] = list(plate_numbers)
 
             out.append(group)
-            current_plate = last_plate
-
-    elif separate_into == 'row':
+            current_plate = max(plate_numbers)+1
 
+    elif separate_into in ('row', 'rows'):
         current_well = start_wells[0]
+        current_plate = 0
+        for group in separate_groups:
+            plate_numbers, well_names = zip(*iterate_wells(len(group), start=current_well, start_plate=current_plate, wells=n_wells, plate=True))
+
+            group['Well'] = list(well_names)
+            group['Plate'] = list(plate_numbers)
 
-        out = []
-        plate = []
-        for i, group in enumerate(separate_groups):
-            plates, wells = zip(*(plates.utils.iterate_wells(len(group), start = current_well, start_plate=current_plate, wells=n_wells, plate=True)))
-            
-            group['Well'] = list(wells)
-            group['Plate'] = list(plates)
-            
             out.append(group)
-            current_well, current_plate = next_row(current_well, wells=n_wells, plate=True, start_plate=current_plate)
+
+            # next level starts on the row after the last well used
+            current_plate, current_well = next_row(well_names[-1], wells=n_wells, plate=True, start_plate=plate_numbers[-1])
     else:
-        plates, wells = zip(*(plates.utils.iterate_wells(len(group), start = start_wells[0], start_plate=0, wells=n_wells, plate=True)))
-        group = df
+        group = separate_groups[0]
+        plate_numbers, well_names = zip(*iterate_wells(len(group), start=start_wells[0], start_plate=0, wells=n_wells, plate=True))
 
-        group['Well'] = list(wells)
-        group['Plate'] = list(plates)
+        group['Well'] = list(well_names)
+        group['Plate'] = list(plate_numbers)
+
+        out.append(group)
 
-        out = [group]
-    
     if separate_dataframes_per_plate:
-        out = pd.concat(out)
-        output_plates = []
-        all_plates = out['Plate'].unique()
-        for j in all_plates:
-            output_plates.append(group.loc[group['Plate'] == j,:])
-        return output_plates
-    return pd.concat(out)
\ No newline at end of file
+        # split each group by plate, rather than combining all of the groups
+        # just to split them again; only plates shared by several groups
+        # (e.g. with `separate_into='rows'`) need to be concatenated
+        pieces = {}
+        for group in out:
+            for plate_number, piece in group.groupby('Plate', sort=False):
+                pieces.setdefault(plate_number, []).append(piece)
+        return [ps[0] if len(ps) == 1 else pd.concat(ps) for ps in pieces.values()]
+    return pd.concat(out)
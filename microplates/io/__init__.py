@@ -1,7 +1,30 @@
-from ..data import platemap_to_dataframe, scale_plate
+from ..data import platemap_to_dataframe, scale_plate, _categorize
+from ..utils import wells2rows_cols
+from .ioutils import open_workbook
+import numpy as np
 import pandas as pd
 
-def read_multiple_plates(tables, read_single, platemap=None, **kwargs):
+_path_keys = ('io', 'path')
+_excel_extensions = ('.xls', '.xlsx', '.xlsm', '.xlsb', '.odf', '.ods', '.odt')
+
+def _open_workbooks(tables, kwargs):
+    """private; open each Excel workbook named by the ``io`` or ``path`` of
+    any table or measure passed to :func:`read_multiple_plates`, as a dict
+    mapping each file name to its :class:`pandas.ExcelFile`
+    """
+    workbooks = {}
+    for table in tables:
+        table = {**kwargs, **table}
+        for measure in table.get("measures", [table]):
+            args = {**table, **measure}
+            for key in _path_keys:
+                path = args.get(key)
+                if (isinstance(path, str) and path.lower().endswith(_excel_extensions)
+                        and path not in workbooks):
+                    workbooks[path] = open_workbook(path)
+    return workbooks
+
+def read_multiple_plates(tables, read_single, platemap=None, share_workbooks=False, n_jobs=1, categorical=False, **kwargs):
     """Reads data for one or more plates, then merges the data together.
 
     This function simplifies reading and data reduction where you have either
@@ -81,6 +104,26 @@ def read_multiple_plates(tables, read_single, platemap=None, **kwargs):
     platemap : dict
         Platemap; will be evaluated by `data.platemap_to_dataframe` and joined
         to each `table`
+    share_workbooks : bool, default=False
+        ``True`` to open each Excel workbook named by an ``io`` or ``path``
+        argument once, as a :class:`pandas.ExcelFile`, and pass that to
+        ``read_single`` in place of the file name. Saves parsing the whole
+        workbook again for each sheet or measure read from it; ``read_single``
+        must accept an ``ExcelFile`` wherever it accepts a path (e.g. it
+        reads the file with :func:`pandas.read_excel`). An ``ExcelFile`` is
+        not safe to read from several threads, so this requires ``n_jobs=1``.
+    n_jobs : int, default=1
+        Number of tables to read at once with ``joblib`` threads (``-1`` for
+        one per CPU); helps when there are many files, as reading them mostly
+        waits on the disk or on the spreadsheet parser. ``read_single`` and
+        any ``transform`` must then be safe to call from several threads.
+        Tables are combined in the same order either way.
+    categorical : bool, default=False
+        ``True`` to store columns of the result that repeat a few distinct
+        strings (or other non-numeric values) across the wells, such as
+        metadata and platemap variables, as :class:`pandas.Categorical`;
+        see :func:`~microplates.data.platemap_to_dataframe`. The well index
+        is left as it is.
     **kwargs : dict, optional
         Additional arguments will be merged into each ``table``, with values
         from the ``table`` overwriting those in ``**kwargs``.
@@ -91,16 +134,27 @@ def read_multiple_plates(tables, read_single, platemap=None, **kwargs):
         Description of anonymous integer return value.
 
     """
-    dfs = []
-
-    special_keys = set(["data","measures","transform","platemap","convert"])
-
-    if platemap is None:
-        platemap = {}
-    platemap = platemap_to_dataframe(platemap)
-
-    # for each file
-    for table in tables:
+    special_keys = set(["data","measures","transform","platemap","convert","scale"])
+
+    if share_workbooks and n_jobs != 1:
+        raise ValueError("share_workbooks=True requires n_jobs=1, as a shared "
+            "workbook cannot be read from several threads at once")
+
+    # a platemap without any rules adds nothing to the data; skip building it
+    # and joining it
+    if platemap:
+        platemap = platemap_to_dataframe(platemap)
+    else:
+        platemap = None
+
+    # per-table platemaps, by the identity of their program and their scaling
+    table_platemaps = {}
+
+    # each table (file) is read on its own, then all are concatenated
+    def read_table(table):
+        """read, label and transform one table, as a DataFrame with a
+        ``well`` column
+        """
         table = {**kwargs, **table}
 
         # extract metadata to add as constant column
@@ -121,20 +175,25 @@ def read_multiple_plates(tables, read_single, platemap=None, **kwargs):
         else:
             transform = None
 
-        # if there is a per-table platefile, grab it
-        if "platemap" in table:
-            table_platemap = table["platemap"]
+        # if there is a per-table platefile, grab it; like the global
+        # platemap, an empty one adds nothing and is not built or merged
+        if table.get("platemap"):
+            # tables often share the same platemap (e.g. given once in
+            # `**kwargs`); build each platemap only once for each scaling
+            key = (id(table["platemap"]), tuple(table.get("scale", ())))
+            if key not in table_platemaps:
+                table_platemap = platemap_to_dataframe(table["platemap"])
+
+                # if instructions to broadcast the per-table mapfile from
+                # one microplate shape to another (e.g. 96 to 384), do the conversion
+                if "scale" in table:
+                    convert_from, convert_to = table["scale"]
+
+                    table_platemap = scale_plate(table_platemap, convert_from, convert_to)
+                table_platemaps[key] = table_platemap
+            table_platemap = table_platemaps[key]
         else:
-            table_platemap = {}
-
-        table_platemap = platemap_to_dataframe(table_platemap)
-
-        # if instructions to broadcast the per-table mapfile from
-        # one microplate shape to another (e.g. 96 to 384), do the conversion
-        if "scale" in table:
-            convert_from, convert_to = table["scale"]
-
-            table_platemap = scale_plate(table_platemap, convert_from, convert_to)
+            table_platemap = None
 
         table = {x: table[x] for x in table if x not in special_keys}
 
@@ -142,27 +201,66 @@ def read_multiple_plates(tables, read_single, platemap=None, **kwargs):
         measure_dfs = []
         for measure in measures:
             measure = {x: measure[x] for x in measure if x not in special_keys}
-            
-            measure_df = read_single(**{ **table, **measure })
+        
+            args = { **table, **measure }
+            for key in _path_keys:
+                if isinstance(args.get(key), str) and args[key] in workbooks:
+                    args[key] = workbooks[args[key]]
+            measure_df = read_single(**args)
             measure_dfs.append(measure_df)
 
         # concatenate different tables in this file, matching the wells
-        df = pd.concat(measure_dfs, join='inner', axis=1)
-        df = pd.merge(left=table_platemap, right=df, left_index=True, right_index=True)
-
-        # apply variables given for the whole table
-        for col in table_metadata:
-            # create any columns that don't exist
-            if col not in df:
-                df[col] = table_metadata[col]
-        df = df.fillna(table_metadata)
+        # and with the per-table platemap; both are indexed by well, so
+        # aligning on the index is enough
+        if table_platemap is not None:
+            measure_dfs = [table_platemap] + measure_dfs
+        if len(measure_dfs) == 1:
+            df = measure_dfs[0]
+        else:
+            df = pd.concat(measure_dfs, join='inner', axis=1)
+
+        # without a platemap to follow, put the wells in plate order (A1, A2,
+        # ..., B1, ...), whatever order `read_single` gave them in; anything
+        # that is not a well name goes last
+        if table_platemap is None:
+            rows, columns = wells2rows_cols(df.index, strict=False)
+            order = np.lexsort((columns, rows, rows < 0))
+            if (np.diff(order) < 0).any():
+                df = df.iloc[order]
+        df = df.rename_axis('well')
+
+        # apply variables given for the whole table: fill in missing values
+        # of columns that already exist, and create the others all at once
+        # as constant columns
+        existing = {col: value for col, value in table_metadata.items() if col in df}
+        if existing:
+            df = df.fillna(existing)
+        new = {col: value for col, value in table_metadata.items() if col not in df}
+        if new:
+            df = pd.concat([df, pd.DataFrame(new, index=df.index)], axis=1)
 
         # apply an arbitrary transformation
         if transform is not None:
             df = transform(df, table)
 
-        dfs.append(df.reset_index())
+        return df.reset_index()
+
+    # open each workbook once for all of the tables and measures read from it
+    workbooks = _open_workbooks(tables, kwargs) if share_workbooks else {}
+    try:
+        if n_jobs == 1:
+            dfs = [read_table(table) for table in tables]
+        else:
+            from joblib import Parallel, delayed
+            dfs = Parallel(n_jobs=n_jobs, prefer='threads')(
+                delayed(read_table)(table) for table in tables)
+    finally:
+        for workbook in workbooks.values():
+            workbook.close()
+
     data = pd.concat(dfs, join='outer', ignore_index=True).set_index('well')
-    # data = pd.merge(left=platemap, right=data, left_index=True, right_index=True)
-    data = data.join(platemap)
+    if platemap is not None:
+        data = data.join(platemap)
+    if categorical:
+        data = _categorize(data)
     return data
@@ -1,6 +1,40 @@
+import numpy as np
 import pandas as pd
 
-def find_header_row(path=None, search=["<>"], keep='first', read=pd.read_excel, df=None, **kwargs):
+# pandas (>= 2.2) reads spreadsheets several times faster with the calamine
+# engine, if python-calamine is installed; otherwise use its default engine
+try:
+    import python_calamine
+    import pandas.io.excel._calamine
+    _excel_engine = 'calamine'
+except ImportError:
+    _excel_engine = None
+
+def read_excel(io, **kwargs):
+    """Read a spreadsheet with :func:`pandas.read_excel`, using the calamine
+    engine if it is available and no `engine` is given
+    """
+    if not isinstance(io, pd.ExcelFile):
+        kwargs.setdefault('engine', _excel_engine)
+    return pd.read_excel(io, **kwargs)
+
+def open_workbook(path, engine=None):
+    """Open a spreadsheet as a :class:`pandas.ExcelFile`, using the calamine
+    engine if it is available and no `engine` is given
+    """
+    return pd.ExcelFile(path, engine=engine or _excel_engine)
+
+def _matching_rows(df, search):
+    """private; labels of the rows of `df` whose first cells equal `search`
+    """
+    # compare the first few columns of every row to `search` at once
+    cells = df.iloc[:, :len(search)].to_numpy(dtype=object)
+    if cells.shape[1] < len(search):
+        return []
+    matches = (cells == np.array(search, dtype=object)).all(axis=1)
+    return df.index[matches].tolist()
+
+def find_header_row(path=None, search=["<>"], keep='first', read=read_excel, df=None, scan_rows=64, **kwargs):
     """Finds the first row matching a particular pattern in an spreadsheet file
 
     Parameters
@@ -12,10 +46,18 @@ def find_header_row(path=None, search=["<>"], keep='first', read=pd.read_excel,
     keep : str, default='first'
         'first' to return the index of the first row that matches `search`, or
         'all' to return a list of indices that match
-    read : function, default=pd.read_excel
-        Function to read the spreadsheet; will be called with `path` and `**kwargs`
+    read : function, default=read_excel
+        Function to read the spreadsheet; will be called with `path` and
+        `**kwargs`, and first with ``nrows`` too (see `scan_rows`) if it
+        accepts it
     df : pd.DataFrame, optional
         Spreadsheet to read directly; can be given in place of `path`
+    scan_rows : int or None, default=64
+        With `path` and ``keep='first'``, first read only this many rows
+        (passed to `read` as ``nrows``), since headers are usually near the
+        top of the file; the whole file is only read if none of them match,
+        or if `read` does not take ``nrows``. ``None`` to always read the
+        whole file.
 
     Returns
     -------
@@ -26,19 +68,25 @@ def find_header_row(path=None, search=["<>"], keep='first', read=pd.read_excel,
         search = [search]
     search = tuple(search)
 
-    headers = []
-
     if df is None:
         if path is None or read is None:
             raise Exception("Must provide either `df` or `path`")
-        df = read(path, **kwargs)
 
-    for row in df.itertuples():
-        if row[1:(1+len(search))] == search:
-            headers.append(row[0])
-            break
+        headers = []
+        if keep == 'first' and scan_rows is not None:
+            try:
+                top = read(path, nrows=scan_rows, **kwargs)
+            except TypeError:
+                # a custom `read` without `nrows`; read the whole file below
+                top = None
+            if top is not None:
+                headers = _matching_rows(top, search)
+        if not headers:
+            headers = _matching_rows(read(path, **kwargs), search)
+    else:
+        headers = _matching_rows(df, search)
     assert len(headers) > 0, ("Unrecognized data format; could not find "+
-        "an appropriate header in Excel file "+path)
+        "an appropriate header in Excel file "+str(path))
 
     if keep == 'first':
         return headers[0]
@@ -50,16 +98,13 @@ def find_header_row(path=None, search=["<>"], keep='first', read=pd.read_excel,
 def melt_plate(df, measure):
     """convert plate from format mirroring physical microtiter plate to a tidy format with columns named "well" and `measure`
     """
-    df.index.rename('row',inplace=True)
-    df.columns.rename('column',inplace=True)
-    df = df.reset_index()
-
-    # convert dataframe from "wide" to "long" format (one well per row)
-    df = df.melt(id_vars=['row'],var_name='column',value_name=measure).reset_index()
+    rows = df.index.to_numpy().astype(str)
+    columns = df.columns.to_numpy().astype(str)
 
-    # generate a column showing the well name (e.g. A1) from column and row
-    df['well'] = df['row'] + df['column'].map(str)
-    df = df.set_index('well')
-    df = df.drop(columns=['row','column','index'])
+    # convert dataframe from "wide" to "long" format (one well per row),
+    # going down each column in turn, and name each well (e.g. A1) from its
+    # row and column
+    wells = np.char.add(np.tile(rows, len(columns)), np.repeat(columns, len(rows)))
+    values = df.to_numpy().ravel(order='F')
 
-    return df
+    return pd.DataFrame({measure: values}, index=pd.Index(wells, name='well'))
@@ -1,20 +1,17 @@
+import numpy as np
 import pandas as pd
 from ..utils import row2letters
-from .ioutils import find_header_row
+from .ioutils import find_header_row, read_excel, melt_plate
+
+# names of the rows of the largest (1536-well, 32-row) plates, with room to spare
+_row_letters = np.array([row2letters(i) for i in range(64)])
 
 def read_single(path,header=None,nrows=8,measure='OD600',blank=None, **kwargs):
     if header is None: header = find_header_row(path, search=["Raw Data"], **kwargs)
-    df = pd.read_excel(path, skiprows=header+1, nrows=nrows, **kwargs)
-
-    df.index = [row2letters(r) for r in df.index]
-    df.index.rename('row',inplace=True)
-    df.columns = [str(i+1) for i,r in enumerate(df.columns)]
-    df.columns.rename('column',inplace=True)
-    df = df.reset_index()
-    df = df.melt(id_vars=['row'],var_name='column', value_name=measure).reset_index()
+    df = read_excel(path, skiprows=header+1, nrows=nrows, **kwargs)
 
-    df['well'] = df['row'] + df['column'].map(str)
-    df = df.set_index('well')
-    df = df.drop(columns=['row','column','index'])
+    # rows and columns are unlabelled; name them A, B, C, ... and 1, 2, 3, ...
+    df.index = _row_letters[:len(df.index)]
+    df.columns = np.arange(1, len(df.columns)+1).astype(str)
 
-    return df
+    return melt_plate(df, measure=measure)
@@ -1,23 +1,27 @@
 import pandas as pd
-from .ioutils import melt_plate
+from .ioutils import melt_plate, find_header_row, read_excel, open_workbook
 
 def read_single(path,header=None,nrows=8,measure='OD600',blank=None, **kwargs):
-    
+
+    # to guess the header row, the file is read twice; parse it only once
+    if header is None and not isinstance(path, pd.ExcelFile):
+        with open_workbook(path, engine=kwargs.pop('engine', None)) as workbook:
+            return read_single(workbook, header=header, nrows=nrows, measure=measure, blank=blank, **kwargs)
+
     # try to guess the header row if not provided
     if header is None:
-        df = pd.read_excel(path, **kwargs)
         try:
-            header = [row[1] for row in df.itertuples()].index("<>")+1
-        except ValueError as e:
+            header = find_header_row(path, search=["<>"], **kwargs)+1
+        except AssertionError as e:
             raise Exception("Unrecognized data format; could not find "+
-            "an appropriate header in Excel file "+path+". \n"+repr(kwargs))
+            "an appropriate header in Excel file "+str(path)+". \n"+repr(kwargs))
 
     # read raw data from excel file, excluding prefix at beginning of file
     # and suffix at end
-    df = pd.read_excel(path,header=header,index_col=0,nrows=nrows, na_values=['OVER'], **kwargs)
+    df = read_excel(path,header=header,index_col=0,nrows=nrows, na_values=['OVER'], **kwargs)
 
     assert df.index.name == "<>", ("Unrecognized data format; make sure `header` is set "+
-                                  "to the row right above '<>' in Excel file "+path+". header = "+str(header))
+                                  "to the row right above '<>' in Excel file "+str(path)+". header = "+str(header))
 
     df = melt_plate(df, measure=measure)
 
@@ -44,23 +48,23 @@ def read_single(path,header=None,nrows=8,measure='OD600',blank=None, **kwargs):
 
 def read_multiple(path,header=None,nrows=96,measure='OD600',blank=None,na_values=['OVER'],npositions=None,**kwargs):
 
+    # to guess the header row, the file is read twice; parse it only once
+    if header is None and not isinstance(path, pd.ExcelFile):
+        with open_workbook(path, engine=kwargs.pop('engine', None)) as workbook:
+            return read_multiple(workbook, header=header, nrows=nrows, measure=measure, blank=blank,
+                na_values=na_values, npositions=npositions, **kwargs)
+
     if header is None:
-        df = pd.read_excel(path,**kwargs)
-        for row in df.itertuples():
-            if row[1] == "Well":
-                header = row[0]+1
-                break
-        assert header is not None, ("Unrecognized data format; could not find "+
-            "an appropriate header in Excel file "+path)
+        header = find_header_row(path, search=["Well"], **kwargs)+1
 
     # read raw data from excel file, excluding prefix at beginning of file
     # and suffix at end
     if npositions is not None:
         kwargs['parse_cols'] = npositions+2
-    df = pd.read_excel(path,header=header,index_col=0,nrows=nrows, **kwargs)
+    df = read_excel(path,header=header,index_col=0,nrows=nrows, **kwargs)
 
     assert df.index.name == "Well", ("Unrecognized data format; make sure `header` is set "+
-                                  "to the row right above '<>' in Excel file "+path)
+                                  "to the row right above '<>' in Excel file "+str(path))
 
     # collect data into "tidy" format, with one row per observation, one column for each variable (well, time, OD600)
     df.columns = df.columns.rename('position')
@@ -77,17 +81,16 @@ def read_multiple(path,header=None,nrows=96,measure='OD600',blank=None,na_values
 
 
 def read_timecourse(path,header=None,platemap=None,**kwargs):
+    # to guess the header row, the file is read twice; parse it only once
+    if header is None and not isinstance(path, pd.ExcelFile):
+        with open_workbook(path) as workbook:
+            return read_timecourse(workbook, header=header, platemap=platemap, **kwargs)
+
     if header is None:
-        df = pd.read_excel(path)
-        for row in df.itertuples():
-            if row[1] == "Time [s]":
-                header = row[0]+1
-                break
-        assert header is not None, ("Unrecognized data format; could not find "+
-            "an appropriate header in Excel file "+path)
-
-    data = pd.read_excel(path,
-                  sheet_name=0, header=header, skip_footer=4, index_col=0)
+        header = find_header_row(path, search=["Time [s]"])+1
+
+    data = read_excel(path,
+                  sheet_name=0, header=header, skipfooter=4, index_col=0)
 
     # Extract temperature vs. time as separate variable
     temps = data.loc['Temp. [°C]',:]
@@ -3,16 +3,17 @@ Plot microplate data.
 """
 
 import re
+import functools
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 
 from .utils import *
+from .utils import _CELL_NAMES
 from .data import fortify_plate, add_row_column, pivot_plate, cherrypick
 
 def parse_hue(values, order=None, palette=None):
-    import seaborn as sns
     # https://stackoverflow.com/questions/26139423/plot-different-color-for-different-categorical-levels-using-matplotlib
 
     if order is None:
@@ -22,14 +23,30 @@ def parse_hue(values, order=None, palette=None):
             levels = values.unique()
     else:
         levels = order
+
+    # the colors only depend on the levels, the palette and (if there is no
+    # palette) the current color cycle, so the same hue map is reused across
+    # the calls of a plot and across facets
+    color_cycle = tuple(sns.utils.get_color_cycle()) if palette is None else None
+    try:
+        hue_map = _hue_map(tuple(levels), palette, color_cycle)
+    except TypeError:
+        # unhashable palette (or levels)
+        hue_map = _hue_map.__wrapped__(tuple(levels), palette, color_cycle)
+    return dict(hue_map)
+
+@functools.lru_cache(maxsize=64)
+def _hue_map(levels, palette, color_cycle):
+    """private; map each of `levels` to an RGB color for :func:`parse_hue`.
+    Cached; callers must copy the result before changing it
+    """
     n_colors = len(levels)
 
     # if palette wasn't specified, use current palette
     if palette is None:
         # Determine whether the current palette will have enough values
         # If not, we'll default to the husl palette so each is distinct
-        current_palette = sns.utils.get_color_cycle()
-        if n_colors <= len(current_palette):
+        if n_colors <= len(color_cycle):
             colors = sns.color_palette(n_colors=n_colors)
         else:
             colors = sns.husl_palette(n_colors, l=.7)
@@ -40,6 +57,23 @@ def parse_hue(values, order=None, palette=None):
     hue_map = dict(zip(levels, colors))
     return hue_map
 
+@functools.lru_cache(maxsize=None)
+def _plate_grid(wells):
+    """private; positions of the columns and rows of a `wells`-well plate,
+    the position of each well (row by row), and the row and column labels,
+    for :func:`plot_plate`. Cached for each plate size; arrays are read-only
+    """
+    shape = plates[wells]
+    xs = np.arange(shape[1])
+    ys = np.arange(shape[0])
+    xx, yy = np.meshgrid(xs,ys)
+    for array in (xs, ys, xx, yy):
+        array.setflags(write=False)
+
+    row_labels = list(map(row2letters, ys))
+    col_labels = list(map(lambda x: str(x+1), xs))
+    return xs, ys, xx, yy, tuple(row_labels), tuple(col_labels)
+
 def plot_plate(plate,labels=None,size=None,
                hue=None,hue_order=None,palette=None,
                text_hue=False,text_hue_order=None,text_palette=None, text_kwargs=None,
@@ -98,78 +132,96 @@ def plot_plate(plate,labels=None,size=None,
         wells = infer_plate_size(plate.index)
 
     shape = plates[wells]
-    xs = np.arange(shape[1])
-    ys = np.arange(shape[0])
-    xx, yy = np.meshgrid(xs,ys)
+    xs, ys, xx, yy, row_labels, col_labels = _plate_grid(wells)
     if ax is None: ax = plt.gca()
 
-    row_labels = list(map(row2letters, ys))
-    col_labels = list(map(lambda x: str(x+1), xs))
+    # find the row of `plate` for every well of the microplate at once, in
+    # the same (row by row) order as the points; wells missing from `plate`
+    # keep the default size and colors
+    well_names = _CELL_NAMES[wells].ravel()
+    rows = plate.index.get_indexer(well_names)
+    found = np.flatnonzero(rows >= 0)
+    rows = rows[found]
+
+    def values(column):
+        """values of `column` (or tuples of values, for a list of columns)
+        for each well found in `plate`
+        """
+        if isinstance(column, str):
+            return plate[column].to_numpy()[rows]
+        return list(plate[column].iloc[rows].itertuples(index=False, name=None))
+
+    def colors(column, hue_map):
+        """RGB color of each well of the microplate; wells missing from
+        `plate` get the default color, like missing values
+        """
+        cs = np.tile(np.asarray(default_color, dtype=float), (shape[0]*shape[1],1))
+        if not isinstance(column, str):
+            cs[found] = [hue_map.get(value, default_color) for value in values(column)]
+            return cs
+
+        # find the level of every well at once, and take its color from a
+        # table of the palette with the default color last; values not in
+        # `hue_map` (code -1) get the default color. `get_indexer` matches
+        # NaN to NaN, so missing values keep the color `parse_hue` gave them
+        column_values = values(column)
+        codes = pd.Index(list(hue_map)).get_indexer(column_values)
+        palette = np.array(list(hue_map.values()) + [default_color], dtype=float)
+        cs[found] = palette[codes]
+        return cs
+
     ss = None
     cs = None
     ecs = None
+    text_cs = None
     if size is not None:
         ss = np.zeros(shape[0]*shape[1])
         if isinstance(size,numbers.Number):
             ss += size
-            size = None
+        else:
+            ss[found] = values(size)
     if hue is not None:
-        cs = np.zeros((shape[0]*shape[1],3))
         hue_map = parse_hue(plate[hue], hue_order, palette)
+        cs = colors(hue, hue_map)
 
     if text_hue is not None and text_hue != True and text_hue != False:
-        text_cs = np.zeros((shape[0]*shape[1],3))
         text_hue_map = parse_hue(plate[text_hue], text_hue_order, text_palette)
+        text_cs = colors(text_hue, text_hue_map)
+    elif text_hue == True and hue is not None:
+        text_cs = cs
 
     if edgecolors is not None:
-        ecs = np.zeros((shape[0]*shape[1],3))
         edgecolors_map = parse_hue(plate[edgecolors], edgecolors_order, edgecolors_palette)
+        ecs = colors(edgecolors, edgecolors_map)
 
     if text_kwargs is None:
         text_kwargs = {}
 
+    # label each well found in the plate
+    if labels is not None:
+        if labels == True:
+            label_values = [well_names[found]]
+        elif isinstance(labels,str):
+            label_values = [values(labels)]
+        elif isinstance(labels,list):
+            label_values = [values(l) for l in labels]
+
+        # positions and colors of all of the labels are worked out up front,
+        # so drawing them only touches matplotlib
+        label_rows, label_cols = np.divmod(found, shape[1])
+        if text_cs is not None:
+            label_colors = text_cs[found]
+        else:
+            label_colors = [default_color] * len(found)
 
-    # Iterate across each well of the plate
-    for i,row in enumerate(ys):
-        for j,col in enumerate(xs):
-            well = row_labels[row]+col_labels[col]
-            if well not in plate.index:
-                continue
-            if size is not None:
-                ss[row*shape[1]+col] = plate.loc[well,size]
-            if hue is not None:
-                cs[row*shape[1]+col,:] = hue_map.get(plate.loc[well,hue],default_color)
-            if edgecolors is not None:
-                ecs[row*shape[1]+col,:] = edgecolors_map.get(plate.loc[well,edgecolors],default_color)
-            if labels is not None:
-                if labels == True:
-                    label = [well]
-                elif isinstance(labels,str):
-                    label = [plate.loc[well,labels]]
-                elif isinstance(labels,list):
-                    label = [plate.loc[well,l] for l in labels]
-
-                if text_hue == True and hue is not None:
-                    if isinstance(hue, str):
-                        color = hue_map.get(plate.loc[well,hue],default_color)
-                    else:
-                        color = hue_map.get(tuple(plate.loc[well,hue]),default_color)
-                elif text_hue != False:
-                    if isinstance(text_hue, str):
-                        color = text_hue_map.get(plate.loc[well,text_hue],default_color)
-                    else:
-                        color = text_hue_map.get(tuple(plate.loc[well,text_hue]),default_color)
-                else:
-                    color = default_color
-
-                for k,txt in enumerate(label):
-                    ax.annotate(
-                        txt,
-                        xy=(col, row), xytext=( col, row-0.2+(0.8*k*1/len(label)) ),
-                        textcoords=ax.transData, #textcoords='offset points',
-                        # ax=ax,
-                        ha='center', va='baseline',
-                        color=color, **text_kwargs)
+        # plain text in data coordinates; an annotation would also carry
+        # an (unused) arrow and a second point to track
+        for m, texts in enumerate(label_values):
+            label_ys = label_rows - 0.2 + (0.8*m*1/len(label_values))
+            for x, y, txt, color in zip(label_cols, label_ys, texts, label_colors):
+                ax.text(x, y, txt,
+                    ha='center', va='baseline',
+                    color=color, **text_kwargs)
 
     # plt.scatter(xx,yy,c=cs,s=ss, edgecolors=ecs, ax=ax, **kwargs)
     ax.scatter(xx,yy,c=cs,s=ss, edgecolors=ecs, **kwargs)
@@ -196,10 +248,18 @@ def plot_cherrypick(pick_wells,**kwargs):
                       hue='pick', hue_order=[True, False], size='size', **kwargs)
 
 def pandas_df_to_markdown_table(df):
-    df_formatted = pd.concat([
-        pd.DataFrame([['---' for i in range(len(df.columns))]], columns=df.columns, index=['---']), 
-    df])
-    return "\n".join(['|'+r+'|' for r in df_formatted.to_csv(sep="|", index=True).split("\n") if r != ''])
+    def line(cells):
+        return '|'+'|'.join(cells)+'|'
+
+    # missing values are left blank
+    def cell(value):
+        return '' if pd.isna(value) else str(value)
+
+    lines = [line([''] + [str(c) for c in df.columns]),
+             line(['---'] * (len(df.columns)+1))]
+    lines += [line([cell(label)] + [cell(value) for value in row])
+              for label, row in zip(df.index, df.itertuples(index=False, name=None))]
+    return "\n".join(lines)
 
 def plate_to_markdown(data, parameter='OD600'):
     # return pivot_plate(data,parameter,natural=True).to_markdown()
@@ -4,6 +4,7 @@ Utility functions for working with microplate data.
 
 
 import re
+import functools
 import collections.abc
 import pandas as pd
 import numpy as np
@@ -61,6 +62,7 @@ def itertuples(x,y, by='row'):
 #         g = m.groups()
 #         return (letters[g[0]], int(g[1])-1)
 
+@functools.lru_cache(maxsize=4096)
 def letters2row(r):
     """Interprets a string of letters as a number in base 26
 
@@ -92,6 +94,8 @@ def letters2row(r):
     return row-1
 
 cell_regex = re.compile(r"^([a-zA-Z]+)(\d+)")
+
+@functools.lru_cache(maxsize=4096)
 def well2tuple(cell):
     """convert a string well name e.g. 'A1' into a zero-based tuple of (row, column)
 
@@ -124,6 +128,7 @@ def is_well(cell):
 
 is_cell = is_well
 
+@functools.lru_cache(maxsize=4096)
 def row2letters(i):
     """Convert a number to a string of letters in base 26, with A=0, B=1, etc.
 
@@ -147,11 +152,65 @@ def row2letters(i):
         i = i // len(_alpha) - 1
     return r
 
+@functools.lru_cache(maxsize=4096)
 def tuple2well(i,j):
     """convert zero-indexed coordinates row `i`, column `j` to a cell name e.g. 'A1'"""
     return row2letters(i) + str(j+1)
 tuple2cell = tuple2well
 
+# name of each well in each plate shape, as an array of shape (rows, columns);
+# converting in bulk by table lookup avoids formatting each name
+_CELL_NAMES = {
+    n: np.array([[tuple2cell(i,j) for j in range(c)] for i in range(r)], dtype=object)
+    for n, (r, c) in plates.items()
+}
+
+# every well of the largest plate, in order; smaller plates use the same names
+_all_wells = pd.Index(_CELL_NAMES[max(_CELL_NAMES)].ravel())
+_all_wells_columns = _CELL_NAMES[max(_CELL_NAMES)].shape[1]
+
+def wells2rows_cols(wells, strict=True):
+    """convert a sequence of well names to zero-based rows and columns, all at once
+
+    Parameters
+    ----------
+    wells : array_like of str
+        Well names, e.g. ``['A1', 'B12']``
+    strict : bool, default=True
+        ``True`` to raise a ValueError for names that are not wells, ``False``
+        to give -1 for both their row and column
+
+    Returns
+    -------
+    rows, columns : np.ndarray of int
+
+    Examples
+    --------
+    >>> wells2rows_cols(['A1', 'G11', 'AB10'])
+    (array([ 0,  6, 27]), array([ 0, 10,  9]))
+
+    See Also
+    --------
+    well2tuple
+    """
+    # look all of the names up at once in a hash table of well names
+    wells = np.asarray(wells, dtype=object)
+    positions = _all_wells.get_indexer(wells)
+    rows, columns = np.divmod(positions, _all_wells_columns)
+
+    # parse anything not found there (e.g. 'A01') the slow way
+    for k in np.flatnonzero(positions < 0):
+        rows[k], columns[k] = cell2tuple(str(wells[k])) or (-1, -1)
+
+    if strict and (rows < 0).any():
+        raise ValueError("Not a well name: %r" % (wells[np.flatnonzero(rows < 0)[0]],))
+    return rows, columns
+cells2rows_cols = wells2rows_cols
+
+_well_range_regex = re.compile(r"([a-zA-Z]\d+):([a-zA-Z]\d+)")
+_row_range_regex = re.compile(r"([a-zA-Z]):([a-zA-Z])")
+_column_range_regex = re.compile(r"(\d+):(\d+)")
+
 def range2wells(rng,wells=96):
     """convert a rectangular range e.g. 'A1:B7' to a pair of wells e.g. ('A1', 'B7').
 
@@ -192,14 +251,14 @@ def range2wells(rng,wells=96):
     """
 
     # e.g. A1:B7
-    m = re.match(r"([a-zA-Z]\d+):([a-zA-Z]\d+)",rng)
+    m = _well_range_regex.match(rng)
     if m is not None:
         return tuple(sorted(m.groups()))
 
     # e.g. A:A -> 'A1','A12'
     # B:D -> 'B1','D12'
     # C:B -> 'B1','C12'
-    m = re.match(r"([a-zA-Z]):([a-zA-Z])",rng)
+    m = _row_range_regex.match(rng)
     if m is not None:
         g = sorted(m.groups())
         return (g[0]+'1', g[1]+str(plates[wells][1]))
@@ -207,12 +266,13 @@ def range2wells(rng,wells=96):
     # e.g. 1:1 -> 'A1','H1'
     # 1:3 -> 'A1','H3'
     # 3:2 -> 'A2','H2'
-    m = re.match(r"(\d+):(\d+)",rng)
+    m = _column_range_regex.match(rng)
     if m is not None:
         g = sorted(int(x) for x in m.groups())
         return (_alpha[0]+str(g[0]), _alpha[plates[wells][0]-1]+str(g[1]))
 range2cells = range2wells
 
+@functools.lru_cache(maxsize=4096)
 def range2tuple(rng, wells=96):
     """convert a range e.g. 'A1:B10' to a sorted pair of zero-based tuples, e.g. ``((0,0),(1,10))``.
 
@@ -244,10 +304,47 @@ def range2well_list(rng, wells=96, by='row'):
     # tuples = range2tuple(rng,wells=wells)
     # if tuples is not None:
     #     return [tuple2cell(*t) for t in itertuples(*tuples, by=by)]
-    return list(iterrange(rng, wells=wells, by=by))
+    return range2well_array(rng, wells=wells, by=by).tolist()
 
 range2cell_list = range2well_list
 
+def range2well_array(rngs, wells=96, by='row'):
+    """convert a range e.g. 'A1:B10' (or comma-separated list of ranges) to an array of well names
+
+    Gives the same wells in the same order as :func:`iterrange`, but all at
+    once, by slicing a table of well names rather than naming each well.
+
+    Examples
+    --------
+    >>> range2well_array('A1:B2,C5:C6')
+    array(['A1', 'A2', 'B1', 'B2', 'C5', 'C6'], dtype=object)
+    >>> range2well_array('A1:B2', by='column')
+    array(['A1', 'B1', 'A2', 'B2'], dtype=object)
+
+    See Also
+    --------
+    iterrange
+    """
+    names = _CELL_NAMES[max(_CELL_NAMES)]
+    blocks = []
+    for rng in rngs.split(','):
+        tuples = range2tuple(rng, wells=wells)
+        if tuples is None:
+            continue
+        (r0, c0), (r1, c1) = tuples
+        if r1 < names.shape[0] and c1 < names.shape[1]:
+            block = names[r0:r1+1, c0:c1+1]
+        else:
+            # beyond the largest plate; name each well
+            block = np.array([[tuple2cell(i,j) for j in range(c0, c1+1)]
+                for i in range(r0, r1+1)], dtype=object).reshape(max(r1-r0+1, 0), -1)
+        blocks.append((block.T if by == 'column' else block).ravel())
+    if not blocks:
+        return np.array([], dtype=object)
+    return np.concatenate(blocks)
+
+range2cell_array = range2well_array
+
 def iterrange(rngs, wells=96, by='row'):
     """Generator over each well in a rectangular range (e.g. 'A1:B10') or comma-separated list of such ranges (e.g. 'A1:B1,C2:D2')
 
@@ -288,12 +385,15 @@ def next_row(well, wells=96, plate=False, start_plate=0):
 
 
     if t[0] >= plate_layouts[wells][0]:
-        if plate:
-            return (start_plate+1, 'A1')
-        else:
-            return 'A1'
+        start_plate += 1
+        well = 'A1'
     else:
-        return tuple2cell(t)
+        well = tuple2cell(*t)
+
+    if plate:
+        return (start_plate, well)
+    else:
+        return well
 
 def next_column(well, wells=96, plate=False, start_plate=0):
     t = cell2tuple(well)
@@ -304,7 +404,7 @@ def next_column(well, wells=96, plate=False, start_plate=0):
         start_plate += 1
         well = 'A1'
     else:
-        well = tuple2cell(t)
+        well = tuple2cell(*t)
 
     if plate:
         return (start_plate, well)
@@ -380,14 +480,19 @@ def iterwells(n, start='A1', wells=96, by='rows', plate=False, start_plate=0):
     """
     cell = list(cell2tuple(start))
     (rows, cols) = plates[wells]
+    if not (0 <= cell[0] < rows and 0 <= cell[1] < cols):
+        raise ValueError("Well %r is not on a %d-well plate" % (start, wells))
+    # well names are precomputed for each plate size; look them up rather
+    # than formatting each one
+    names = _CELL_NAMES[wells]
 
     current_plate = start_plate
 
     while n > 0:
         if plate:
-            yield( (current_plate,tuple2cell(*cell)) )
+            yield( (current_plate,names[cell[0], cell[1]]) )
         else:
-            yield(tuple2cell(*cell))
+            yield(names[cell[0], cell[1]])
 
         n = n - 1
 
@@ -451,9 +556,9 @@ def infer_plate_size(cells, all=False, prefer96=False, prefer=None):
     if prefer96:
         prefer = 96
 
-    cells = [cell2tuple(w) for w in cells]
-    max_row = max(w[0] for w in cells)
-    max_col = max(w[1] for w in cells)
+    rows, cols = wells2rows_cols(cells)
+    max_row = rows.max()
+    max_col = cols.max()
     possible_plates = []
     for nwells in plates:
         if plates[nwells][0] > max_row and plates[nwells][1] > max_col:
@@ -1,8 +1,20 @@
 from microplates.calculate import *
 
+import pytest
 import pandas as pd
 import numpy as np
 
+def _example_plate(**kwargs):
+    """three wells at two time points; `kwargs` are passed to pd.DataFrame"""
+    return pd.DataFrame([
+        ('A1', 0.004, 0, 10),
+        ('A2', 0.002, 0, 10),
+        ('A3', 0.003, 0, 100),
+        ('A1', 0.044, 1, 10),
+        ('A2', 0.042, 1, 10),
+        ('A3', 0.043, 1, 100),
+    ], columns=('well','OD600','time','concentration'), **kwargs)
+
 def test_calc_norm():
     df = pd.DataFrame([
             ('A1', 0.004, 0, 10),
@@ -14,12 +26,14 @@ def test_calc_norm():
     # normalize OD600 to the value at time = 0 for each concentration
     df2 = calc_norm(df, value='OD600', on='time', columns=['time','concentration'], how=lambda x: x - x.loc[0])
     assert np.allclose(df2.query('well == "A1" & time == 0').OD600,0)
-    assert np.allclose(df2.query('well == "A2 & time == 0"').OD600,0)
+    assert np.allclose(df2.query('well == "A2" & time == 0').OD600,0)
+    assert np.allclose(df2.query('well == "A2" & time == 1').OD600,0.022)
 
     # normalize OD600 to the value of concentration = 10 at each timepoint
     df2 = calc_norm(df, value='OD600', on='concentration', columns=['time','concentration'], how=lambda x: x - x.loc[10])
     assert np.allclose(df2.query('well == "A1" & time == 0').OD600,0)
-    assert np.allclose(df2.query('well == "A1 & time == 1"').OD600,0)
+    assert np.allclose(df2.query('well == "A1" & time == 1').OD600,0)
+    assert np.allclose(df2.query('well == "A2" & time == 1').OD600,0.005)
 
     df = pd.DataFrame([
         ('A1', 0.004, 0, 10),
@@ -32,3 +46,194 @@ def test_calc_norm():
 
     # normalize OD600 to average value of the wells at the zero time point
     df2 = calc_norm(df, value='OD600', on='time', columns=['time','concentration'], how=lambda x: x - x.loc[0].mean())
+    assert np.allclose(df2.query('time == 0').OD600, [0.001, -0.001, 0])
+    assert np.allclose(df2.query('time == 1').OD600, [0.041, 0.039, 0.040])
+
+def test_calc_norm_name_group():
+    df = pd.DataFrame([
+            ('A1', 0.004, 0, 10),
+            ('A2', 0.005, 0, 100),
+            ('A1', 0.022, 1, 10),
+            ('A2', 0.027, 1, 100),
+        ], columns=('well','OD600','time','concentration'))
+
+    # `how` may also accept the name of the group...
+    df2 = calc_norm(df, value='OD600', on='time', columns=['concentration'], how=lambda x, n: x - x.loc[0] + n['concentration'])
+    assert np.allclose(df2.query('well == "A1" & time == 0').OD600, 10)
+    assert np.allclose(df2.query('well == "A2" & time == 1').OD600, 100.022)
+
+    # ...and the entire group
+    df2 = calc_norm(df, value='OD600', on='time', columns=['concentration'], how=lambda x, n, g: x - g.loc[0, 'OD600'])
+    assert np.allclose(df2.query('time == 0').OD600, 0)
+    assert np.allclose(df2.query('well == "A2" & time == 1').OD600, 0.022)
+
+    # results keep their dtype, whichever arguments `how` takes
+    for how in [lambda x: x > x.loc[0], lambda x, n: x > x.loc[0], lambda x, n, g: x > x.loc[0]]:
+        df2 = calc_norm(df, value='OD600', on='time', columns=['concentration'], how=how)
+        assert df2.OD600.dtype == bool
+        assert df2.OD600.tolist() == [False, False, True, True]
+    df2 = calc_norm(df, value='OD600', on='time', columns=['concentration'], how=lambda x, n: (x > x.loc[0]).map({True: 'up', False: 'flat'}))
+    assert df2.OD600.tolist() == ['flat', 'flat', 'up', 'up']
+    df2 = calc_norm(df, value='time', on='well', columns=['concentration'], how=lambda x, n: x * 2)
+    assert df2.time.dtype == df.time.dtype
+
+def test_calc_norm_aligns_by_label():
+    df = pd.DataFrame([
+        ('A1', 0.022, 1),
+        ('A2', 0.024, 1),
+        ('A1', 0.004, 0),
+        ('A2', 0.002, 0),
+    ], columns=('well','OD600','time'))
+
+    # a Series returned by `how` is matched to the group by its labels
+    for how in [lambda x: (x - x.loc[0]).iloc[::-1],
+                lambda x, n: (x - x.loc[0]).iloc[::-1],
+                lambda x, n, g: (x - x.loc[0]).iloc[::-1]]:
+        df2 = calc_norm(df, value='OD600', on='time', columns=['well'], how=how)
+        assert np.allclose(df2.OD600, [0.018, 0.022, 0, 0])
+
+def test_calc_norm_builtins():
+    df = _example_plate()
+
+    df2 = calc_norm(df, value='OD600', on='time', columns=['well'], how=SubtractAt(0))
+    df3 = calc_norm(df, value='OD600', on='time', columns=['well'], how=lambda x: x - x.loc[0])
+    assert np.allclose(df2.OD600, df3.OD600)
+
+    df2 = calc_norm(df, value='OD600', on='time', columns=['concentration'], how=SubtractMeanAt(0))
+    df3 = calc_norm(df, value='OD600', on='time', columns=['concentration'], how=lambda x: x - x.loc[0].mean())
+    assert np.allclose(df2.OD600, df3.OD600)
+
+def test_calc_norm_numba():
+    pytest.importorskip('numba')
+    df = _example_plate()
+
+    df2 = calc_norm(df, value='OD600', on='time', columns=['well'], how=SubtractAt(0), engine='numba')
+    df3 = calc_norm(df, value='OD600', on='time', columns=['well'], how=SubtractAt(0))
+    assert np.allclose(df2.OD600, df3.OD600)
+
+    df2 = calc_norm(df, value='OD600', on='time', columns=['concentration'], how=SubtractMeanAt(0), engine='numba')
+    df3 = calc_norm(df, value='OD600', on='time', columns=['concentration'], how=SubtractMeanAt(0))
+    assert np.allclose(df2.OD600, df3.OD600)
+
+def test_calc_norm_numba_reference():
+    pytest.importorskip('numba')
+    df = pd.DataFrame([
+        ('A1', 0.004, 0),
+        ('A1', 0.044, 1),
+        ('A2', 0.042, 1),
+    ], columns=('well','OD600','time'))
+
+    # a group without a value at the key
+    for how in [SubtractAt(0), SubtractMeanAt(0)]:
+        with pytest.raises(KeyError):
+            calc_norm(df, value='OD600', on='time', columns=['well'], how=how, engine='numba')
+
+    # a group with several values at the key
+    df['well'] = ['A1', 'A1', 'A1']
+    with pytest.raises(ValueError):
+        calc_norm(df, value='OD600', on='time', columns=['well'], how=SubtractAt(1), engine='numba')
+    df2 = calc_norm(df, value='OD600', on='time', columns=['well'], how=SubtractMeanAt(1), engine='numba')
+    df3 = calc_norm(df, value='OD600', on='time', columns=['well'], how=SubtractMeanAt(1))
+    assert np.allclose(df2.OD600, df3.OD600)
+
+def test_calc_norm_missing_key():
+    df = _example_plate()
+    df.loc[len(df)] = (np.nan, 0.005, 0, 10)
+
+    # rows with a missing group key come out as NaN with either engine
+    engines = [None]
+    try:
+        import numba
+        engines.append('numba')
+    except ImportError:
+        pass
+    for engine in engines:
+        for how in [SubtractAt(0), SubtractMeanAt(0)]:
+            df2 = calc_norm(df, value='OD600', on='time', columns=['well'], how=how, engine=engine)
+            assert np.allclose(df2.OD600, [0, 0, 0, 0.040, 0.040, 0.040, np.nan], equal_nan=True)
+
+def test_calc_norm_dask():
+    pytest.importorskip('dask.dataframe')
+    df = _example_plate(index=list('abcdef'))
+
+    df2 = calc_norm(df, value='OD600', on='time', columns=['well'], how=SubtractAt(0), engine='dask', engine_kwargs={'npartitions': 2})
+    df3 = calc_norm(df, value='OD600', on='time', columns=['well'], how=SubtractAt(0))
+    assert df2.index.equals(df.index)
+    assert np.allclose(df2.OD600, df3.OD600)
+
+def test_calc_norm_n_jobs():
+    pytest.importorskip('joblib')
+    df = _example_plate()
+
+    for how in [lambda x: x - x.loc[0],
+                lambda x, name: x - x.loc[0],
+                lambda x, name, group: x - x.loc[0]]:
+        df2 = calc_norm(df, value='OD600', on='time', columns=['well'], how=how, n_jobs=2)
+        df3 = calc_norm(df, value='OD600', on='time', columns=['well'], how=how)
+        assert np.allclose(df2.OD600, df3.OD600)
+
+    # results are aligned by label either way, even when `how` depends on
+    # the order of the rows
+    df2 = df.iloc[[3, 4, 0, 1]]
+    for how in [lambda x: x.sort_index().diff().fillna(0),
+                lambda x, name: x.sort_index().diff().fillna(0)]:
+        serial = calc_norm(df2, value='OD600', on='time', columns=['well'], how=how)
+        parallel = calc_norm(df2, value='OD600', on='time', columns=['well'], how=how, n_jobs=2)
+        assert np.allclose(serial.OD600, [0.040, 0.040, 0, 0])
+        assert np.allclose(parallel.OD600, serial.OD600)
+
+    # rows with a missing group key are in no group, and come out as NaN
+    df.loc[len(df)] = (np.nan, 0.005, 0, 10)
+    for how in [lambda x: x - x.loc[0],
+                lambda x, name: x - x.loc[0]]:
+        df2 = calc_norm(df, value='OD600', on='time', columns=['well'], how=how, n_jobs=2)
+        df3 = calc_norm(df, value='OD600', on='time', columns=['well'], how=how)
+        assert np.allclose(df2.OD600, df3.OD600, equal_nan=True)
+        assert np.isnan(df2.OD600.iloc[-1])
+
+def test_normalize_default():
+    df = pd.DataFrame([
+        ('A1', 0.004, 0),
+        ('A2', 0.002, 0),
+        ('A1', 0.044, 1),
+        ('A2', 0.042, 1),
+    ], columns=('well','OD600','time'))
+
+    df2 = normalize(df, value='OD600', on='time', groupby=['well'])
+    assert np.allclose(df2.OD600, [0, 0, 0.040, 0.040])
+
+def test_calc_norm_name_series():
+    df = pd.DataFrame([
+        ('A1', 0.004, 0, 10),
+        ('A2', 0.002, 0, 100),
+        ('A1', 0.044, 1, 10),
+        ('A2', 0.042, 1, 100),
+    ], columns=('well','OD600','time','concentration'))
+
+    seen = []
+    def how(x, name):
+        assert isinstance(name, pd.Series)
+        assert name['well'] == name.loc['well']
+        assert list(name.index) == ['well', 'concentration']
+        assert pd.Series(name).equals(name)
+        assert np.asarray(name).dtype == object
+        assert (name * 2)['well'] == name['well'] * 2
+        seen.append(tuple(name))
+        return x
+    calc_norm(df, value='OD600', on='time', columns=['well','concentration'], how=how)
+    assert seen == [('A1', 10), ('A2', 100)]
+
+def test_calc_norm_releases_how():
+    import gc, weakref
+    df = pd.DataFrame([
+        ('A1', 0.004, 0),
+        ('A1', 0.044, 1),
+    ], columns=('well','OD600','time'))
+
+    offset = 1.0
+    how = lambda x, n: x - x.loc[0] + offset
+    ref = weakref.ref(how)
+    calc_norm(df, value='OD600', on='time', columns=['well'], how=how)
+    del how
+    gc.collect()
+    assert ref() is None
@@ -1,4 +1,5 @@
 from microplates.data import *
+import pytest
 
 def test_platemap_to_dataframe():
 
@@ -32,6 +33,29 @@ def test_platemap_to_dataframe():
     s = platemap_to_dataframe({'G7:G10':{ 'conc': 5 }})
     assert s.loc['G9','conc'] == 5
 
+    s = platemap_to_dataframe({'A1':{ 'strain': 1 }, 'A2':{ 'strain': 'B. theta' }})
+    assert s.loc['A1','strain'] == 1
+    assert s.loc['A2','strain'] == 'B. theta'
+
+    with pytest.raises(ValueError):
+        platemap_to_dataframe({'A1:A3,B5':{ 'conc': [[0,10,100]] }})
+    with pytest.raises(ValueError):
+        platemap_to_dataframe({'A1:A13':{ 'conc': 5 }})
+
+    # 0-d arrays are broadcast like scalars
+    s = platemap_to_dataframe({'A1:B2':{ 'conc': np.array(5) }})
+    assert (s.loc[['A1','A2','B1','B2'],'conc'] == 5).all()
+
+    s = platemap_to_dataframe({'A1:H6':{ 'strain': 'B. theta', 'conc': 1 }}, categorical=True)
+    assert s['strain'].dtype == 'category'
+    assert s['conc'].dtype == float
+    assert s.loc['A1','strain'] == 'B. theta'
+
+    # unhashable values are left as they are
+    s = platemap_to_dataframe({'A1:H6':{ 'strain': 'B. theta', 'opts': {'a': 1} }}, categorical=True)
+    assert s['strain'].dtype == 'category'
+    assert s.loc['A1','opts'] == {'a': 1}
+
 
 def test_spec96to384():
 
@@ -161,3 +185,41 @@ def test_plate_pivot():
     assert all(df2.index == ['A', 'B'])
     assert all(df2.loc['A',:] == df2.loc['B',:])
     assert all(df2.loc['A',:] == [0.25,  0.3,  0.21])
+
+def test_pivot_plate():
+
+    s = platemap_to_dataframe({'A1:B2':{ 'OD600': [[1,2],[3,4]] }}, wells=24)
+    p = pivot_plate(s)
+    assert p.shape == (4, 6)
+    assert p.loc['B',2] == 4
+    assert np.isnan(p.loc['D',6])
+
+    p = pivot_plate(s, natural=False)
+    assert p.loc[1,0] == 3
+
+    p = pivot_plate(platemap_to_dataframe({'A1:AF48':{ 'OD600': 1 }}, wells=1536))
+    assert list(p.index[:3]) == ['A', 'B', 'C']
+    assert p.index[-1] == 'AF'
+
+def test_assign_wells():
+
+    df = pd.DataFrame({
+        'library': ['a'] * 100 + ['b'] * 10,
+        'sample': range(110)
+    })
+
+    out = assign_wells(df, separate_samples_by='library', separate_into='plates')
+    assert list(out.index) == list(df.index)
+    assert out.loc[0, 'Well'] == 'A1' and out.loc[0, 'Plate'] == 0
+    assert out.loc[96, 'Well'] == 'A1' and out.loc[96, 'Plate'] == 1
+    assert out.loc[100, 'Well'] == 'A1' and out.loc[100, 'Plate'] == 2
+
+    out = assign_wells(df, separate_samples_by='library', separate_into='rows')
+    assert out.loc[99, 'Well'] == 'A4' and out.loc[99, 'Plate'] == 1
+    assert out.loc[100, 'Well'] == 'B1' and out.loc[100, 'Plate'] == 1
+
+    plates = assign_wells(df, separate_samples_by='library', separate_into='plates', separate_dataframes_per_plate=True)
+    assert [len(p) for p in plates] == [96, 4, 10]
+
+    plates = assign_wells(df, separate_samples_by='library', separate_into='rows', separate_dataframes_per_plate=True)
+    assert [len(p) for p in plates] == [96, 14]
@@ -1,3 +1,4 @@
+import pytest
 import pandas as pd
 from microplates.io import *
 
@@ -41,3 +42,78 @@ def test_read_multiple_plates():
     ], read_single = read_single, io='plates.xlsx', measure='OD600' )
     assert(sorted(df.columns) == sorted(['OD600', 'plate']))
     assert(all(df.loc[df['plate'] == 1, 'OD600'] == df.loc[df['plate'] == 2, 'OD600']))
+
+def test_read_multiple_plates_n_jobs():
+    def read_single(io, measure='OD600', **kwargs):
+        return pd.DataFrame({measure: [float(io[5]), 0.002]},
+            index=pd.Index(['A1', 'A2'], name='well'))
+
+    tables = [{ 'io': 'plate%d.xlsx' % i, 'data': {'plate':i} } for i in range(1, 6)]
+    serial = read_multiple_plates(tables, read_single=read_single)
+    parallel = read_multiple_plates(tables, read_single=read_single, n_jobs=2)
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert list(parallel['plate']) == [1, 1, 2, 2, 3, 3, 4, 4, 5, 5]
+
+    # a shared workbook cannot be read from several threads
+    with pytest.raises(ValueError):
+        read_multiple_plates(tables, read_single=read_single, share_workbooks=True, n_jobs=2)
+
+def test_find_header_row():
+    from microplates.io.ioutils import find_header_row
+    df = pd.DataFrame({'a': ['Plate', '<>', None, '<>'], 'b': [None, 1, 2, 3]})
+    assert find_header_row(df=df) == 1
+    assert find_header_row(df=df, keep='last') == 3
+    assert find_header_row(df=df, keep='all') == [1, 3]
+    assert find_header_row(df=df, search=['<>', 3]) == 3
+
+    # reads only the top of the file, unless the header is further down
+    sheet = pd.DataFrame({'a': ['x'] * 100 + ['<>'] + ['x'] * 10})
+    calls = []
+    def read(path, nrows=None):
+        calls.append(nrows)
+        return sheet.head(nrows) if nrows is not None else sheet
+    assert find_header_row('plate.xlsx', read=read, scan_rows=20) == 100
+    assert calls == [20, None]
+    calls.clear()
+    sheet.loc[5, 'a'] = '<>'
+    assert find_header_row('plate.xlsx', read=read, scan_rows=20) == 5
+    assert calls == [20]
+
+    # a `read` that does not take `nrows` reads the whole file
+    assert find_header_row('plate.xlsx', read=lambda path: sheet, scan_rows=20) == 5
+
+def test_read_multiple_plates_platemap():
+    def read_single(io, measure='OD600', **kwargs):
+        return pd.DataFrame({measure: [0.1, 0.2, 0.3]},
+            index=pd.Index(['A1', 'A2', 'B1'], name='well'))
+
+    # the same per-table platemap for two tables, another for the third
+    layout = {'A1:A2': {'strain': 'PAO1'}, 'B1': {'strain': 'PA14'}}
+    df = read_multiple_plates([
+        { 'io': 'plate1.xlsx', 'data': {'plate':1}, 'platemap': layout },
+        { 'io': 'plate2.xlsx', 'data': {'plate':2}, 'platemap': layout },
+        { 'io': 'plate3.xlsx', 'data': {'plate':3}, 'platemap': {'A1:A2,B1': {'strain': 'none'}} }
+    ], read_single=read_single, platemap={'A1:A12': {'media': 'LB'}})
+    assert list(df['strain']) == ['PAO1', 'PAO1', 'PA14'] * 2 + ['none'] * 3
+    assert list(df['media'].fillna('')) == ['LB', 'LB', ''] * 3
+
+    df = read_multiple_plates([
+        { 'io': 'plate1.xlsx', 'data': {'plate':1}, 'platemap': layout },
+        { 'io': 'plate2.xlsx', 'data': {'plate':2}, 'platemap': layout }
+    ], read_single=read_single, categorical=True)
+    assert isinstance(df['strain'].dtype, pd.CategoricalDtype)
+    assert not isinstance(df['OD600'].dtype, pd.CategoricalDtype)
+
+def test_read_multiple_plates_order():
+    # wells read in column-major order come out in plate order, with or
+    # without a per-table platemap
+    def read_single(io, measure='OD600', **kwargs):
+        return pd.DataFrame({measure: [0.1, 0.2, 0.3, 0.4]},
+            index=pd.Index(['A1', 'B1', 'A2', 'B2'], name='well'))
+
+    df = read_multiple_plates([
+        { 'io': 'plate1.xlsx', 'data': {'plate':1}, 'platemap': {'A1:B2': {'strain': 'PAO1'}} },
+        { 'io': 'plate2.xlsx', 'data': {'plate':2} }
+    ], read_single=read_single)
+    assert list(df.index) == ['A1', 'A2', 'B1', 'B2'] * 2
+    assert list(df['OD600']) == [0.1, 0.3, 0.2, 0.4] * 2
@@ -1,5 +1,7 @@
 from microplates.utils import *
 
+import pytest
+
 def test_itertuples():
     assert list(itertuples((0,0),(0,2))) == [(0,0),(0,1),(0,2)]
     assert list(itertuples((1,0),(2,0))) == [(1,0),(2,0)]
@@ -22,6 +24,18 @@ def test_cell2tuple():
     assert cell2tuple('AB10') == (27,9)
     assert cell2tuple('BA12') == (52,11)
 
+def test_cells2rows_cols():
+    rows, cols = cells2rows_cols(['A1', 'H10', 'AA1', 'BA12', 'A01'])
+    assert list(rows) == [0, 7, 26, 52, 0]
+    assert list(cols) == [0, 9, 0, 11, 0]
+    rows, cols = cells2rows_cols(['A1', 'foo'], strict=False)
+    assert list(rows) == [0, -1] and list(cols) == [0, -1]
+    try:
+        cells2rows_cols(['A1', 'foo'])
+        assert False
+    except ValueError:
+        pass
+
 def test_is_cell():
     assert is_cell('A1')
     assert is_cell('F12')
@@ -74,6 +88,11 @@ def test_iterwells():
     assert list(iterwells(16,by='columns')) == ['A1', 'B1', 'C1', 'D1', 'E1', 'F1', 'G1', 'H1', 'A2', 'B2', 'C2', 'D2', 'E2', 'F2', 'G2', 'H2']
     assert list(iterwells(48, wells=384)) == ['A1', 'A2', 'A3', 'A4', 'A5', 'A6', 'A7', 'A8', 'A9', 'A10', 'A11', 'A12', 'A13', 'A14', 'A15', 'A16', 'A17', 'A18', 'A19', 'A20', 'A21', 'A22', 'A23', 'A24', 'B1', 'B2', 'B3', 'B4', 'B5', 'B6', 'B7', 'B8', 'B9', 'B10', 'B11', 'B12', 'B13', 'B14', 'B15', 'B16', 'B17', 'B18', 'B19', 'B20', 'B21', 'B22', 'B23', 'B24']
 
+    with pytest.raises(ValueError):
+        list(iterwells(2, start='I1', wells=96))
+    with pytest.raises(ValueError):
+        list(iterwells(2, start='A13', wells=96))
+
 
 def test_infer_plate_size():
     assert infer_plate_size(['H12']) == infer_plate_size(['A1','H12']) == infer_plate_size(range2cell_list('A1:H12')) == 96